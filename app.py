@@ -1,134 +1,198 @@
 import os
-import base64
-import io
 import logging
 import traceback
 import time
-import gc
 import json
-from flask import Flask, request, jsonify
+import queue
+from threading import Lock, Thread
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+from contextlib import nullcontext
+from extractors import extract_bounded_text, extract_documents, EXTRACTION_FORMAT_GROUPS
+from uploads import SpoolingRequest, SpooledUpload, parse_json_uploads, UPLOAD_FOLDER
+from jobs import get_job_manager, JOB_TIME_BUDGET, JOB_RETRY_AFTER
+from concurrency import (
+    get_admission_control, estimate_upload_cost, estimate_text_cost, QueueFullError, SUMMARY_RETRY_AFTER
+)
+from nltk_setup import use_local_nltk_data, NLTK_DATA_REQUIRED
+import metrics
+
+SUMMARY_MODES = ('abstractive', 'extractive')
+# Lightweight workers that only serve mode=extractive and never load the model weights
+EXTRACTIVE_ONLY = os.getenv('EXTRACTIVE_ONLY', '0') == '1'
+# Retry-After sent while the model is still loading in the background
+MODEL_WARMUP_RETRY_AFTER = int(os.getenv('MODEL_WARMUP_RETRY_AFTER', '15'))
+# Load the model before gunicorn forks (preload_app) so workers share its pages copy-on-write
+MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', '0') == '1'
+# Seconds between keep-alive comments on an idle event stream
+SSE_KEEPALIVE = float(os.getenv('SSE_KEEPALIVE', '15'))
+
+def _sse(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 def create_app():
     app = Flask(__name__)
+    app.request_class = SpoolingRequest
     
     # Enhanced configuration for large file uploads
     app.config['MAX_CONTENT_LENGTH'] = 1.1 * 1024 * 1024 * 1024  # 1.1GB max upload size
-    app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
     # Initialize resources
-    executor = ThreadPoolExecutor(max_workers=10)
-    from model import get_model
-    summarization_model = get_model()
+    from cache import get_summary_cache
+    use_local_nltk_data(required=NLTK_DATA_REQUIRED)
+    if not EXTRACTIVE_ONLY:
+        # Bind right away and load in the background, unless the gunicorn master preloads it
+        from model import get_model_cache, start_model_warmup, model_status, model_ready
+        start_model_warmup(background=not MODEL_PRELOAD)
+    summary_cache = get_summary_cache()
+    job_manager = get_job_manager()
+    admission_control = get_admission_control()
+    metrics.start_flusher()
 
-    def extract_text_from_document(content, file_type):
+    def _read_uploads():
+        """Spooled uploads from a multipart or base64 JSON request, or None for other formats."""
+        if request.files:
+            # Multipart form file upload, already spooled to disk by SpoolingRequest
+            return [
+                SpooledUpload(filename, file_storage.stream)
+                for filename, file_storage in request.files.items()
+            ]
+        if request.is_json:
+            # JSON payload with base64 encoded files, decoded incrementally to disk
+            _, uploads = parse_json_uploads(request.stream)
+            return uploads
+        return None
+
+    def _summarize_uploads(uploads, summary_depth, max_time=None, progress_callback=None, mode='abstractive',
+                           partial_callback=None, document_callback=None, reservation=None):
         """
-        Enhanced text extraction with comprehensive error handling for multiple file types.
+        Extract text from uploads and summarize it.
         
         Args:
-            content (bytes/str): Document content 
-            file_type (str): Type of document (pdf, docx, xlsx, etc.)
+            uploads (list): SpooledUpload instances
+            summary_depth (float): Depth of summarization
+            max_time (float): Per-document time budget, model default if None
+            progress_callback (Callable): Receives (chunks done, chunks added) increments
+            mode (str): 'abstractive' runs the model, 'extractive' only ranks sentences
+            partial_callback (Callable): Receives (title, level, chunk index, summary) per finished chunk
+            document_callback (Callable): Receives each summary dictionary as soon as it is ready
+            reservation (Reservation): Admission reservation grown by each extracted text's cost
         
         Returns:
-            str: Extracted text content or empty string if extraction fails
+            list: Summary dictionaries, or None if no document contained text
         """
-        try:
-            # Convert content to bytes if it's a base64 string
-            if isinstance(content, str):
-                try:
-                    content = base64.b64decode(content)
-                except Exception:
-                    # If base64 decoding fails, treat as plain text
-                    return content
-
-            # Comprehensive text extraction for multiple file types
-            extractors = {
-                'pdf': lambda c: _extract_pdf_text(c),
-                'docx': lambda c: _extract_docx_text(c),
-                'doc': lambda c: _extract_docx_text(c),
-                'xlsx': lambda c: _extract_excel_text(c),
-                'xls': lambda c: _extract_excel_text(c),
-                'pptx': lambda c: _extract_pptx_text(c),
-                'ppt': lambda c: _extract_pptx_text(c),
-                'txt': lambda c: c.decode('utf-8', errors='ignore'),
-                'md': lambda c: c.decode('utf-8', errors='ignore'),
-                'png': lambda c: _extract_image_text(c),
-                'jpg': lambda c: _extract_image_text(c),
-                'jpeg': lambda c: _extract_image_text(c)
-            }
+        # Jobs accepted during warm-up wait here until the model has loaded; the model
+        # is held until summarization finishes so the registry cannot evict it mid-request
+        if mode == 'extractive':
+            model_context = nullcontext()
+        else:
+            model_cache = get_model_cache()
+            model_context = model_cache.use(model_cache.model_name_for(summary_depth))
+        with model_context as summarization_model:
+            summarizer_name = 'extractive' if mode == 'extractive' else summarization_model.model_name
+            documents = _extracted_documents(uploads, summarizer_name, summary_depth, reservation)
+            # Documents stream into summarization as they are extracted; only an empty request is known up front
+            first_document = next(documents, None)
+            if first_document is None:
+                return None
+            documents = chain([first_document], documents)
 
-            # Normalize file type to lowercase
-            file_type = file_type.lower()
-            
-            # Select appropriate extractor or use generic text extraction
-            extractor = extractors.get(file_type, lambda c: c.decode('utf-8', errors='ignore'))
-            
-            extracted_text = extractor(content)
-            return extracted_text if extracted_text else ""
+            # Import summarization modules
+            from summarie import generate_summary, generate_extractive_summary
 
-        except Exception as e:
-            logging.error(f"Error extracting text from {file_type} file: {str(e)}")
-            return ""
-        finally:
-            gc.collect()
+            if mode == 'extractive':
+                return generate_extractive_summary(documents, summary_depth, document_callback=document_callback)
 
-    def _extract_pdf_text(content):
-        try:
-            from pdfminer.high_level import extract_text
-            return extract_text(io.BytesIO(content))
-        except Exception as e:
-            logging.error(f"PDF text extraction error: {str(e)}")
-            return ""
+            # Generate summaries
+            return generate_summary(
+                model=summarization_model,
+                documents=documents,
+                summary_depth=summary_depth,
+                max_time=max_time,
+                progress_callback=progress_callback,
+                partial_callback=partial_callback,
+                document_callback=document_callback
+            )
 
-    def _extract_docx_text(content):
-        try:
-            from docx import Document
-            doc = Document(io.BytesIO(content))
-            return "\n".join([para.text for para in doc.paragraphs if para.text])
-        except Exception as e:
-            logging.error(f"DOCX text extraction error: {str(e)}")
-            return ""
+    def _extracted_documents(uploads, summarizer_name, summary_depth, reservation=None):
+        """
+        Yield a document dictionary per upload with text, as soon as its text is available.
+        
+        Cached summaries and uploads without a file on disk come first. Other files of
+        multi-file requests are extracted side by side in the format process pools; a
+        single file is extracted on this thread, where PDFs still go to the PDF pool by page,
+        except images, which always go to the OCR workers that keep tesseract loaded.
+        """
+        def document(upload, file_type, cache_key, extracted_text, truncated):
+            if not extracted_text.strip():
+                return None
+            if reservation is not None:
+                reservation.grow(estimate_text_cost(extracted_text))
+            return {
+                'name': upload.name,
+                'content': extracted_text,
+                'type': file_type,
+                'cache_key': cache_key,
+                'truncated': truncated
+            }
 
-    def _extract_excel_text(content):
-        try:
-            from openpyxl import load_workbook
-            wb = load_workbook(io.BytesIO(content), read_only=True)
-            text = ""
-            for sheet in wb:
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = " | ".join([str(cell) for cell in row if cell])
-                    if row_text:
-                        text += row_text + "\n"
-            return text
-        except Exception as e:
-            logging.error(f"Excel text extraction error: {str(e)}")
-            return ""
+        pooled, inline = {}, []
+        for index, upload in enumerate(uploads):
+            file_type = upload.name.split('.')[-1].lower()
+            with upload.open() as content:
+                cache_key = summary_cache.make_key(content, summarizer_name, summary_depth)
+            cached_summary = summary_cache.get(cache_key)
+            if cached_summary is not None:
+                yield {
+                    'name': upload.name,
+                    'type': file_type,
+                    'summary': cached_summary
+                }
+            elif upload.path and (len(uploads) > 1 or EXTRACTION_FORMAT_GROUPS.get(file_type) == 'ocr'):
+                pooled[index] = (upload, file_type, cache_key)
+            else:
+                inline.append((upload, file_type, cache_key))
 
-    def _extract_pptx_text(content):
-        try:
-            from pptx import Presentation
-            prs = Presentation(io.BytesIO(content))
-            text = ""
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text:
-                        text += shape.text + "\n"
-            return text
-        except Exception as e:
-            logging.error(f"PPTX text extraction error: {str(e)}")
-            return ""
+        extracted = extract_documents(
+            (index, upload.path, file_type) for index, (upload, file_type, _) in pooled.items()
+        )
+        for upload, file_type, cache_key in inline:
+            with upload.open() as content:
+                extracted_text, truncated = extract_bounded_text(content, file_type)
+            processed = document(upload, file_type, cache_key, extracted_text, truncated)
+            if processed:
+                yield processed
+        for index, extracted_text, truncated in extracted:
+            processed = document(*pooled[index], extracted_text, truncated)
+            if processed:
+                yield processed
 
-    def _extract_image_text(content):
-        try:
-            import pytesseract
-            from PIL import Image
-            image = Image.open(io.BytesIO(content))
-            return pytesseract.image_to_string(image) or ""
-        except Exception as e:
-            logging.error(f"Image text extraction error: {str(e)}")
-            return ""
+    def _request_mode():
+        return (request.form.get('mode') or request.args.get('mode', 'abstractive')).lower()
+
+    def _mode_unavailable(mode):
+        """Error response if this worker cannot serve mode right now, else None."""
+        if mode not in SUMMARY_MODES:
+            return jsonify({
+                'status': 'error', 
+                'message': f"Invalid mode '{mode}'. Use one of: {', '.join(SUMMARY_MODES)}"
+            }), 400
+        if mode == 'abstractive' and EXTRACTIVE_ONLY:
+            return jsonify({
+                'status': 'error', 
+                'message': 'This worker only serves mode=extractive'
+            }), 503
+        if mode == 'abstractive' and not model_ready():
+            return jsonify({
+                'status': 'error', 
+                'message': 'Summarization model is still loading, retry later'
+            }), 503, {'Retry-After': str(MODEL_WARMUP_RETRY_AFTER)}
+        return None
 
     @app.route('/summarize', methods=['POST'])
     def summarize_documents():
@@ -136,71 +200,33 @@ def create_app():
         Enhanced endpoint for document summarization with robust error handling.
         """
         start_time = time.time()
+        uploads = []
         try:
             # Extract parameters from form data or JSON
             summary_depth = float(request.form.get('summary_depth', 0.3))
             user_id = request.form.get('user_id', 'default_user')
+            mode = _request_mode()
+            mode_error = _mode_unavailable(mode)
+            if mode_error is not None:
+                return mode_error
 
             # Determine input method (multipart form or base64 JSON)
-            if request.files:
-                # Multipart form file upload
-                uploaded_files = request.files
-                processed_documents = []
-
-                for filename, file_storage in uploaded_files.items():
-                    content = file_storage.read()
-                    file_type = filename.split('.')[-1].lower()
-                    
-                    extracted_text = extract_text_from_document(content, file_type)
-                    
-                    if extracted_text.strip():
-                        processed_documents.append({
-                            'name': filename,
-                            'content': extracted_text,
-                            'type': file_type
-                        })
-
-            elif request.is_json:
-                # JSON payload with base64 encoded files
-                json_data = request.json
-                processed_documents = []
-
-                for file_info in json_data.get('files', []):
-                    filename = file_info.get('name', 'unknown')
-                    content = file_info.get('content', '')
-                    file_type = filename.split('.')[-1].lower()
-
-                    extracted_text = extract_text_from_document(content, file_type)
-                    
-                    if extracted_text.strip():
-                        processed_documents.append({
-                            'name': filename,
-                            'content': extracted_text,
-                            'type': file_type
-                        })
-            else:
+            request_uploads = _read_uploads()
+            if request_uploads is None:
                 return jsonify({
                     'status': 'error', 
                     'message': 'Invalid request format. Use multipart/form-data or application/json'
                 }), 400
+            uploads = request_uploads
 
-            # Check if any documents were processed
-            if not processed_documents:
+            with admission_control.slot(estimate_upload_cost(uploads)) as reservation:
+                summaries = _summarize_uploads(uploads, summary_depth, mode=mode, reservation=reservation)
+            if summaries is None:
                 return jsonify({
                     'status': 'error', 
                     'message': 'No valid documents found for summarization'
                 }), 400
 
-            # Import summarization modules
-            from summarie import generate_summary
-
-            # Generate summaries
-            summaries = generate_summary(
-                model=summarization_model,
-                documents=processed_documents,
-                summary_depth=summary_depth
-            )
-
             execution_time = time.time() - start_time
             
             return jsonify({
@@ -209,6 +235,11 @@ def create_app():
                 'execution_time': execution_time
             })
 
+        except QueueFullError as e:
+            return jsonify({
+                'status': 'error',
+                'message': f"{e}, retry later"
+            }), 429, {'Retry-After': str(SUMMARY_RETRY_AFTER)}
         except Exception as e:
             logging.error(f"Summarization process error: {e}")
             logging.error(traceback.format_exc())
@@ -217,7 +248,225 @@ def create_app():
                 'message': str(e)
             }), 500
         finally:
-            gc.collect()
+            for upload in uploads:
+                upload.close()
+
+    @app.route('/summarize/stream', methods=['POST'])
+    def stream_summary():
+        """
+        Summarize like /summarize, streaming Server-Sent Events as work completes.
+        
+        Events: 'partial' per finished chunk summary (title, level, chunk, summary),
+        'progress' with cumulative chunk counts, 'summary' per finished document, then
+        'done' with the /summarize response body or 'error'.
+        """
+        start_time = time.time()
+        uploads = []
+        try:
+            summary_depth = float(request.form.get('summary_depth', 0.3))
+            mode = _request_mode()
+            mode_error = _mode_unavailable(mode)
+            if mode_error is not None:
+                return mode_error
+
+            request_uploads = _read_uploads()
+            if request_uploads is None:
+                return jsonify({
+                    'status': 'error', 
+                    'message': 'Invalid request format. Use multipart/form-data or application/json'
+                }), 400
+            uploads = request_uploads
+
+            # The slot is held by the summarization thread and released when it finishes
+            reservation = admission_control.acquire(estimate_upload_cost(uploads))
+            try:
+                # Summarization outlives this view function; it gets its own links to the files
+                detached_uploads = [upload.detach() for upload in uploads]
+            except Exception:
+                reservation.release()
+                raise
+        except QueueFullError as e:
+            return jsonify({
+                'status': 'error',
+                'message': f"{e}, retry later"
+            }), 429, {'Retry-After': str(SUMMARY_RETRY_AFTER)}
+        except Exception as e:
+            logging.error(f"Error starting summary stream: {e}")
+            logging.error(traceback.format_exc())
+            return jsonify({
+                'status': 'error', 
+                'message': str(e)
+            }), 500
+        finally:
+            for upload in uploads:
+                upload.close()
+
+        events = queue.Queue()
+        progress = {'chunks_done': 0, 'chunks_total': 0}
+        progress_lock = Lock()
+
+        def report_progress(done, added):
+            with progress_lock:
+                progress['chunks_done'] += done
+                progress['chunks_total'] += added
+                events.put(('progress', dict(progress)))
+
+        def report_partial(title, level, index, summary):
+            events.put(('partial', {'title': title, 'level': level, 'chunk': index, 'summary': summary}))
+
+        def run():
+            try:
+                summaries = _summarize_uploads(
+                    detached_uploads, summary_depth, progress_callback=report_progress, mode=mode,
+                    partial_callback=report_partial,
+                    document_callback=lambda summary: events.put(('summary', summary)),
+                    reservation=reservation
+                )
+                if summaries is None:
+                    events.put(('error', {
+                        'status': 'error', 
+                        'message': 'No valid documents found for summarization'
+                    }))
+                else:
+                    events.put(('done', {
+                        'status': 'success',
+                        'summaries': summaries,
+                        'execution_time': time.time() - start_time
+                    }))
+            except Exception as e:
+                logging.error(f"Summary stream error: {e}")
+                logging.error(traceback.format_exc())
+                events.put(('error', {'status': 'error', 'message': str(e)}))
+            finally:
+                for upload in detached_uploads:
+                    upload.close()
+                reservation.release()
+                events.put(None)
+
+        Thread(target=run, name='summary-stream', daemon=True).start()
+
+        def stream():
+            while True:
+                try:
+                    event = events.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if event is None:
+                    return
+                yield _sse(*event)
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    def _run_summary_job(uploads, summary_depth, progress_callback):
+        """Job body: summarize detached uploads and remove them afterwards."""
+        start_time = time.time()
+        try:
+            # JobManager bounds the job queue itself; jobs only wait here for memory and a slot
+            with admission_control.slot(
+                estimate_upload_cost(uploads), wait_timeout=JOB_TIME_BUDGET, bounded_queue=False
+            ) as reservation:
+                summaries = _summarize_uploads(
+                    uploads, summary_depth, JOB_TIME_BUDGET, progress_callback, reservation=reservation
+                )
+            if summaries is None:
+                raise ValueError('No valid documents found for summarization')
+            return {
+                'summaries': summaries,
+                'execution_time': time.time() - start_time
+            }
+        finally:
+            for upload in uploads:
+                upload.close()
+
+    @app.route('/jobs', methods=['POST'])
+    def create_summary_job():
+        """
+        Accept documents for background summarization and return a job id immediately.
+        """
+        uploads = []
+        try:
+            summary_depth = float(request.form.get('summary_depth', 0.3))
+            if EXTRACTIVE_ONLY:
+                return jsonify({
+                    'status': 'error', 
+                    'message': 'This worker only serves mode=extractive'
+                }), 503
+
+            request_uploads = _read_uploads()
+            if request_uploads is None:
+                return jsonify({
+                    'status': 'error', 
+                    'message': 'Invalid request format. Use multipart/form-data or application/json'
+                }), 400
+            uploads = request_uploads
+            if not uploads:
+                return jsonify({
+                    'status': 'error', 
+                    'message': 'No valid documents found for summarization'
+                }), 400
+
+            # The request's temp files are removed when it ends; the job keeps its own links
+            detached_uploads = [upload.detach() for upload in uploads]
+            try:
+                job = job_manager.submit(partial(_run_summary_job, detached_uploads, summary_depth))
+            except QueueFullError:
+                for upload in detached_uploads:
+                    upload.close()
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Summarization queue is full, retry later'
+                }), 429, {'Retry-After': str(JOB_RETRY_AFTER)}
+
+            return jsonify({
+                'status': 'success',
+                'job_id': job.job_id,
+                'state': job.state,
+                'status_url': f"/jobs/{job.job_id}",
+                'result_url': f"/jobs/{job.job_id}/result"
+            }), 202
+
+        except Exception as e:
+            logging.error(f"Error creating summary job: {e}")
+            logging.error(traceback.format_exc())
+            return jsonify({
+                'status': 'error', 
+                'message': str(e)
+            }), 500
+        finally:
+            for upload in uploads:
+                upload.close()
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def get_summary_job(job_id):
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+        job.pop('result', None)
+        return jsonify({'status': 'success', **job}), 200
+
+    @app.route('/jobs/<job_id>/result', methods=['GET'])
+    def get_summary_job_result(job_id):
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+        if job['state'] == 'failed':
+            return jsonify({'status': 'error', 'job_id': job_id, 'message': job['error']}), 500
+        if job['state'] != 'completed':
+            return jsonify({
+                'status': 'pending',
+                'job_id': job_id,
+                'state': job['state'],
+                'progress': job['progress']
+            }), 202
+
+        return jsonify({'status': 'success', 'job_id': job_id, **job['result']}), 200
     
     @app.route('/feedback', methods=['POST'])
     def feedback():
@@ -249,16 +498,28 @@ def create_app():
             logging.error(traceback.format_exc())
             return jsonify({'error': str(e)}), 500
 
+    def _readiness():
+        """Model state for health checks and whether this worker can serve abstractive requests."""
+        if EXTRACTIVE_ONLY:
+            return 'disabled', True
+        state = model_status()
+        model_state = {'ready': 'healthy', 'failed': 'unavailable'}.get(state['state'], state['state'])
+        return model_state, model_ready()
+
     @app.route('/health', methods=['GET'])
     def health_check():
         try:
-            model_status = 'healthy' if summarization_model else 'unavailable'
+            model_state, ready = _readiness()
             
             return jsonify({
                 'status': 'healthy',
                 'service': 'document-summarizer',
                 'version': os.environ.get('APP_VERSION', '1.0.0'),
-                'model_status': model_status,
+                'live': True,
+                'ready': ready,
+                'model_status': model_state,
+                'models': {} if EXTRACTIVE_ONLY else model_status()['models'],
+                'load': admission_control.stats(),
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
             }), 200
         except Exception as e:
@@ -268,6 +529,27 @@ def create_app():
                 'error': str(e)
             }), 500
 
+    @app.route('/health/live', methods=['GET'])
+    def liveness_check():
+        return jsonify({'status': 'alive'}), 200
+
+    @app.route('/health/ready', methods=['GET'])
+    def readiness_check():
+        model_state, ready = _readiness()
+        if not ready:
+            return jsonify({'status': 'not ready', 'model_status': model_state}), 503, {
+                'Retry-After': str(MODEL_WARMUP_RETRY_AFTER)
+            }
+        return jsonify({'status': 'ready', 'model_status': model_state}), 200
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        try:
+            return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+        except Exception as e:
+            logging.error(f"Error rendering metrics: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
     return app
 
 # Create the application instance
@@ -0,0 +1,154 @@
+import os
+import time
+import logging
+from difflib import SequenceMatcher
+from typing import Callable, Tuple
+import torch
+from transformers import pipeline
+
+# torch | torch-int8 | onnx
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'torch').lower()
+# Compare the selected backend against float32 torch at startup; disabling it also
+# quantizes in place so the float32 weights are never held twice
+BACKEND_VERIFY = os.getenv('BACKEND_VERIFY', '1') == '1'
+BACKEND_MIN_AGREEMENT = float(os.getenv('BACKEND_MIN_AGREEMENT', '0.6'))
+ONNX_EXPORT_DIR = os.getenv('ONNX_EXPORT_DIR', 'onnx_models')
+# Intra-op threads per process; 0 divides the cores between the gunicorn workers
+TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', '0'))
+
+_VERIFY_TEXT = (
+    "Artificial intelligence (AI) is a rapidly evolving field of computer science that aims to create "
+    "intelligent machines that can perform tasks that typically require human intelligence. These tasks "
+    "include learning, problem-solving, perception, language understanding, and decision-making. Machine "
+    "learning, a subset of AI, focuses on developing algorithms that can learn from and make predictions "
+    "based on data. However, the rapid advancement of AI also raises important ethical and societal "
+    "questions about privacy, job displacement and bias in AI algorithms."
+)
+
+
+def configure_torch_threads(num_threads: int = TORCH_NUM_THREADS) -> int:
+    """
+    Size torch's CPU thread pools so concurrent workers do not oversubscribe the cores.
+    
+    Returns:
+        int: Intra-op threads now in use
+    """
+    if num_threads <= 0:
+        workers = max(1, int(os.getenv('GUNICORN_WORKERS', '1')))
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+    torch.set_num_threads(num_threads)
+    try:
+        # Only one batch runs at a time, so inter-op parallelism buys nothing
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once any parallel work has run in this process
+        pass
+    logging.info(f"Using {num_threads} torch threads")
+    return num_threads
+
+
+def torch_pipeline(model, tokenizer) -> Callable:
+    """Reference float32 (float16 on CUDA) PyTorch summarization pipeline."""
+    return pipeline(
+        "summarization",
+        model=model,
+        tokenizer=tokenizer,
+        device=0 if torch.cuda.is_available() else -1,
+        framework="pt",
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+    )
+
+
+def _quantized_pipeline(model, tokenizer) -> Callable:
+    if torch.cuda.is_available():
+        raise RuntimeError("Dynamic int8 quantization only applies to CPU inference")
+    quantized = torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=not BACKEND_VERIFY
+    )
+    return pipeline("summarization", model=quantized, tokenizer=tokenizer, device=-1, framework="pt")
+
+
+def _onnx_pipeline(model_name: str, tokenizer, token=None) -> Callable:
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise RuntimeError("The onnx backend needs optimum[onnxruntime] installed")
+
+    export_dir = os.path.join(ONNX_EXPORT_DIR, model_name.replace('/', '--'))
+    if os.path.isdir(export_dir) and any(name.endswith('.onnx') for name in os.listdir(export_dir)):
+        ort_model = ORTModelForSeq2SeqLM.from_pretrained(export_dir, use_cache=True)
+    else:
+        # Encoder, decoder and decoder-with-past graphs, so generation reuses cached key/values
+        logging.info(f"Exporting {model_name} to ONNX in {export_dir}")
+        ort_model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True, token=token)
+        ort_model.save_pretrained(export_dir)
+    return pipeline("summarization", model=ort_model, tokenizer=tokenizer)
+
+
+def verify_backend(candidate: Callable, reference: Callable, tokenizer) -> float:
+    """
+    Compare greedy summaries of a fixed text from the candidate and reference backends.
+
+    Returns:
+        float: Token sequence agreement between the two outputs, from 0.0 to 1.0
+    """
+    generate_kwargs = {'max_length': 60, 'min_length': 10, 'num_beams': 1, 'do_sample': False, 'truncation': True}
+
+    start = time.time()
+    expected = reference(_VERIFY_TEXT, **generate_kwargs)[0]['summary_text']
+    reference_time = time.time() - start
+
+    start = time.time()
+    actual = candidate(_VERIFY_TEXT, **generate_kwargs)[0]['summary_text']
+    candidate_time = time.time() - start
+
+    agreement = SequenceMatcher(None, tokenizer.tokenize(expected), tokenizer.tokenize(actual)).ratio()
+    logging.info(
+        f"Backend check: agreement {agreement:.2f}, "
+        f"reference {reference_time:.2f}s, candidate {candidate_time:.2f}s"
+    )
+    return agreement
+
+
+def build_summarizer(backend: str, model, tokenizer, model_name: str, token=None) -> Tuple[Callable, str]:
+    """
+    Create the summarization pipeline for the requested inference backend.
+
+    Falls back to the PyTorch pipeline if the backend cannot be created or its
+    output diverges from the reference by more than BACKEND_MIN_AGREEMENT allows.
+
+    Args:
+        backend (str): torch, torch-int8 or onnx
+        model: Loaded PyTorch seq2seq model
+        tokenizer: Matching tokenizer
+        model_name (str): Hugging Face model id, used for the ONNX export
+        token (str): Hugging Face API token
+
+    Returns:
+        Tuple[Callable, str]: Summarization pipeline and the backend actually in use
+    """
+    if backend == 'torch':
+        return torch_pipeline(model, tokenizer), 'torch'
+
+    try:
+        if backend == 'torch-int8':
+            candidate = _quantized_pipeline(model, tokenizer)
+        elif backend == 'onnx':
+            candidate = _onnx_pipeline(model_name, tokenizer, token)
+        else:
+            raise ValueError(f"Unknown inference backend '{backend}'")
+
+        if BACKEND_VERIFY:
+            agreement = verify_backend(candidate, torch_pipeline(model, tokenizer), tokenizer)
+            if agreement < BACKEND_MIN_AGREEMENT:
+                raise RuntimeError(
+                    f"{backend} output agreement {agreement:.2f} is below {BACKEND_MIN_AGREEMENT}"
+                )
+        logging.info(f"Using {backend} inference backend")
+        return candidate, backend
+    except Exception as e:
+        logging.error(f"Falling back to torch inference backend: {str(e)}")
+        if backend == 'torch-int8' and not BACKEND_VERIFY:
+            # The float32 weights were quantized in place; reload them for the fallback
+            model = type(model).from_pretrained(model_name, token=token)
+        return torch_pipeline(model, tokenizer), 'torch'
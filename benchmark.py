@@ -0,0 +1,313 @@
+"""
+Benchmark the extraction -> preprocessing -> chunking -> generation pipeline.
+
+Generates synthetic documents in every supported format at several sizes, times
+each stage separately and prints p50/p95 latency, throughput and peak RSS as JSON.
+
+    python benchmark.py --model tiny --sizes small,medium --repeat 3 --output bench.json
+
+``--model tiny`` builds a randomly initialised two-layer BART with a BPE tokenizer
+trained on the synthetic corpus, so the suite runs offline and in seconds; pass a
+Hugging Face model id (e.g. facebook/bart-large-cnn) to benchmark real weights.
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from typing import Callable, Dict, List
+import psutil
+
+from extractors import extract_text_from_document
+
+FORMATS = ['pdf', 'docx', 'xlsx', 'pptx', 'txt', 'png']
+SIZES = {'small': 500, 'medium': 5000, 'large': 50000}  # words per document
+
+_WORDS = (
+    "model data system analysis report revenue growth market customer product service quarter annual "
+    "strategy risk performance team project development research result policy process quality cost "
+    "increase decrease region sales forecast investment operation technology network security energy"
+).split()
+
+
+def synthetic_text(words: int, seed: int = 0) -> str:
+    """Deterministic pseudo-English text of roughly ``words`` words."""
+    rng = random.Random(seed)
+    sentences, count = [], 0
+    while count < words:
+        length = rng.randint(8, 24)
+        sentence = ' '.join(rng.choice(_WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + '.')
+        count += length
+    return ' '.join(sentences)
+
+
+def _paragraphs(text: str, size: int = 60) -> List[str]:
+    words = text.split()
+    return [' '.join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+def build_document(file_type: str, text: str) -> bytes:
+    """Render text as a document of the given type."""
+    buffer = io.BytesIO()
+    if file_type == 'pdf':
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+        pdf = canvas.Canvas(buffer, pagesize=letter)
+        y = 750
+        for line in _paragraphs(text, 12):
+            pdf.drawString(40, y, line)
+            y -= 14
+            if y < 40:
+                pdf.showPage()
+                y = 750
+        pdf.save()
+    elif file_type == 'docx':
+        from docx import Document
+        document = Document()
+        for paragraph in _paragraphs(text):
+            document.add_paragraph(paragraph)
+        document.save(buffer)
+    elif file_type == 'xlsx':
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for paragraph in _paragraphs(text, 20):
+            sheet.append([paragraph, len(paragraph)])
+        workbook.save(buffer)
+    elif file_type == 'pptx':
+        from pptx import Presentation
+        from pptx.util import Inches
+        presentation = Presentation()
+        for paragraph in _paragraphs(text, 120):
+            slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+            slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6)).text_frame.text = paragraph
+        presentation.save(buffer)
+    elif file_type == 'png':
+        from PIL import Image, ImageDraw
+        lines = _paragraphs(text, 10)[:200]
+        image = Image.new('L', (1200, 20 * len(lines) + 40), color=255)
+        draw = ImageDraw.Draw(image)
+        for index, line in enumerate(lines):
+            draw.text((20, 20 + 20 * index), line, fill=0)
+        image.save(buffer, format='PNG')
+    else:
+        buffer.write(text.encode('utf-8'))
+    return buffer.getvalue()
+
+
+class PeakRSS:
+    """Samples resident memory on a background thread and records the peak."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure(func: Callable, repeat: int, units: Callable = None) -> Dict:
+    """
+    Run func ``repeat`` times and summarize latency, throughput and peak RSS.
+
+    Args:
+        func (Callable): Stage to time; its last return value is kept
+        repeat (int): Number of timed runs
+        units (Callable): Maps the stage result to the amount of work done, for throughput
+
+    Returns:
+        Dict: Timing statistics plus the stage result under ``'result'``
+    """
+    timings, result = [], None
+    with PeakRSS() as rss:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+
+    p50 = percentile(timings, 50)
+    stats = {
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'peak_rss_mb': round(rss.peak / 1024 / 1024, 1),
+        'result': result
+    }
+    if units is not None and p50 > 0:
+        stats['throughput_per_s'] = round(units(result) / p50, 1)
+    return stats
+
+
+def build_tiny_model(corpus: List[str], directory: str) -> str:
+    """
+    Save a randomly initialised tiny BART and a BPE tokenizer trained on corpus.
+
+    Returns:
+        str: Directory to pass as model_name to SummarizationModel
+    """
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+    from transformers import BartConfig, BartForConditionalGeneration, PreTrainedTokenizerFast
+
+    special_tokens = ['<s>', '<pad>', '</s>', '<unk>', '<mask>']
+    tokenizer = Tokenizer(models.BPE(unk_token='<unk>'))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(vocab_size=1000, special_tokens=special_tokens))
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single='<s> $A </s>',
+        pair='<s> $A </s> </s> $B </s>',
+        special_tokens=[('<s>', 0), ('</s>', 2)]
+    )
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token='<s>', eos_token='</s>', pad_token='<pad>', unk_token='<unk>', mask_token='<mask>',
+        model_max_length=1024
+    )
+    fast_tokenizer.save_pretrained(directory)
+
+    config = BartConfig(
+        vocab_size=len(fast_tokenizer), d_model=32, max_position_embeddings=1024,
+        encoder_layers=1, decoder_layers=1, encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=64, decoder_ffn_dim=64,
+        pad_token_id=1, bos_token_id=0, eos_token_id=2, decoder_start_token_id=2, forced_bos_token_id=0
+    )
+    BartForConditionalGeneration(config).save_pretrained(directory)
+    return directory
+
+
+def run(formats: List[str], sizes: List[str], repeat: int, model_name: str, max_chunks: int,
+        summary_depth: float) -> Dict:
+    # Every repeat would otherwise time a cache lookup instead of recognition
+    import ocr
+    ocr.OCR_CACHE_ENABLED = False
+    corpora = {size: synthetic_text(SIZES[size], seed=index) for index, size in enumerate(sizes)}
+
+    model = None
+    if model_name:
+        from model import SummarizationModel
+        if model_name == 'tiny':
+            model_name = build_tiny_model(list(corpora.values()), tempfile.mkdtemp(prefix='tiny-bart-'))
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            model = SummarizationModel(model_name)
+            load_time = time.perf_counter() - start
+        model_stats = {'load_s': round(load_time, 2), 'peak_rss_mb': round(rss.peak / 1024 / 1024, 1)}
+
+    results = {}
+    for file_type in formats:
+        results[file_type] = {}
+        for size in sizes:
+            document = build_document(file_type, corpora[size])
+            stages = {}
+
+            stats = measure(lambda: extract_text_from_document(document, file_type), repeat, lambda _: len(document))
+            text = stats.pop('result')
+            stats['throughput_unit'] = 'bytes'
+            stages['extract_text_from_document'] = stats
+
+            if model is not None:
+                stats = measure(lambda: model.preprocess_text(text), repeat, len)
+                cleaned = stats.pop('result')
+                stats['throughput_unit'] = 'chars'
+                stages['preprocess_text'] = stats
+
+                input_tokens = len(model.tokenizer(cleaned, add_special_tokens=False, verbose=False)['input_ids'])
+                stats = measure(lambda: model.chunk_text(cleaned), repeat, lambda _: input_tokens)
+                chunks = stats.pop('result')[:max_chunks]
+                stats['throughput_unit'] = 'tokens'
+                stages['chunk_text'] = stats
+
+                def generate():
+                    outputs = []
+                    for chunk in chunks:
+                        params = model._generation_params(chunk, summary_depth)
+                        if params is not None:
+                            outputs.extend(model.summarizer([chunk], truncation=True, **params))
+                    return outputs
+
+                chunk_tokens = sum(len(model.tokenizer(c, verbose=False)['input_ids']) for c in chunks)
+                stats = measure(generate, repeat, lambda _: chunk_tokens)
+                stats.pop('result')
+                stats['throughput_unit'] = 'input tokens'
+                stats['chunks'] = len(chunks)
+                stages['summarizer'] = stats
+
+            results[file_type][size] = {
+                'document_bytes': len(document),
+                'extracted_chars': len(text),
+                'stages': stages
+            }
+            print(f"{file_type}/{size} done", file=sys.stderr)
+
+    report = {
+        'config': {
+            'formats': formats,
+            'sizes': {size: SIZES[size] for size in sizes},
+            'repeat': repeat,
+            'model': model_name,
+            'summary_depth': summary_depth,
+            'max_chunks': max_chunks,
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    if model is not None:
+        report['model'] = model_stats
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the document summarization pipeline")
+    parser.add_argument('--formats', default=','.join(FORMATS), help="Comma-separated file types")
+    parser.add_argument('--sizes', default='small,medium', help=f"Comma-separated sizes from {', '.join(SIZES)}")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per stage")
+    parser.add_argument('--model', default='tiny', help="'tiny', a model id or path, or '' to time extraction only")
+    parser.add_argument('--max-chunks', type=int, default=4, help="Chunks per document sent to the summarizer")
+    parser.add_argument('--summary-depth', type=float, default=0.3)
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(
+        formats=[f for f in args.formats.split(',') if f],
+        sizes=[s for s in args.sizes.split(',') if s],
+        repeat=max(1, args.repeat),
+        model_name=args.model,
+        max_chunks=args.max_chunks,
+        summary_depth=args.summary_depth
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
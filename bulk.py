@@ -0,0 +1,259 @@
+"""
+Summarize a whole directory of documents offline and write one JSON line per file.
+
+Files are extracted in the per-format process pools a window at a time, and the
+window's texts are summarized as they arrive, so the inference scheduler
+batches chunks from many documents at once. Every result is appended to the
+output and then recorded in a checkpoint file with the output's length after
+it; an interrupted run started again with the same arguments truncates any
+unrecorded tail and skips the files already done.
+
+    python bulk.py archive/ --output summaries.jsonl --summary-depth 0.3
+
+Each output line holds ``path`` (relative to the input directory) and either
+``summary``, with ``truncated`` set when the text stopped at the extraction
+size budget, or ``error``. Files that yield no text are recorded as done with an
+error. Documents whose summarization failed or ran out of time are recorded
+with an error but not marked done, so the next run retries them and appends a
+new line; the last line for a path is its current result.
+"""
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import timedelta
+from typing import Dict, Iterator, List, NamedTuple, Set, Tuple
+
+from extractors import extract_documents, supported_file_types
+from jobs import JOB_TIME_BUDGET
+
+# Files extracted and summarized together; bounds the extracted text held in memory
+BULK_WINDOW = int(os.getenv('BULK_WINDOW', '64'))
+BULK_PROGRESS_INTERVAL = float(os.getenv('BULK_PROGRESS_INTERVAL', '10'))
+
+
+class SourceFile(NamedTuple):
+    relative_path: str
+    path: str
+    file_type: str
+    size: int
+
+
+def find_documents(input_dir: str) -> List[SourceFile]:
+    """Every file under input_dir with a supported extension, in a stable order."""
+    file_types = set(supported_file_types())
+    documents = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            file_type = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+            if file_type not in file_types:
+                continue
+            path = os.path.join(root, name)
+            documents.append(SourceFile(os.path.relpath(path, input_dir), path, file_type, os.path.getsize(path)))
+    return documents
+
+
+def load_checkpoint(checkpoint_path: str, output_path: str) -> Tuple[Set[str], int]:
+    """
+    Read the files a previous run finished and cut the output back to the last recorded result.
+
+    Returns:
+        Tuple[Set[str], int]: Relative paths already done, and the output length they account for
+    """
+    done, offset, valid_length = set(), 0, 0
+    if not os.path.exists(checkpoint_path):
+        return done, offset
+
+    with open(checkpoint_path, 'r+b') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line torn by the interruption; the file it names is simply redone
+                break
+            if not entry.get('failed'):
+                done.add(entry['path'])
+            offset = entry['offset']
+            valid_length += len(line)
+        f.truncate(valid_length)
+
+    output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    if output_size < offset:
+        logging.warning(f"{output_path} is shorter than {checkpoint_path} records, starting over")
+        for path in (output_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return set(), 0
+    if output_size > offset:
+        with open(output_path, 'r+b') as f:
+            f.truncate(offset)
+    return done, offset
+
+
+class ResultWriter:
+    """Appends results to the output and records each one in the checkpoint once it is on disk."""
+
+    def __init__(self, output_path: str, checkpoint_path: str):
+        self.output = open(output_path, 'ab')
+        self.checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+
+    def write(self, record: Dict, failed: bool = False):
+        """Append record; a failed one keeps the output offset but leaves its file to be retried."""
+        self.output.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        entry = {'path': record['path'], 'offset': self.output.tell()}
+        if failed:
+            entry['failed'] = True
+        self.checkpoint.write(json.dumps(entry) + '\n')
+        self.checkpoint.flush()
+
+    def close(self):
+        self.output.close()
+        self.checkpoint.close()
+
+
+class Progress:
+    """Logs files and bytes done, throughput and an ETA at most once per interval."""
+
+    def __init__(self, total_files: int, total_bytes: int, interval: float = BULK_PROGRESS_INTERVAL):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.start_time = time.time()
+        self.last_report = self.start_time
+
+    def advance(self, size: int):
+        self.files += 1
+        self.bytes += size
+        now = time.time()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        files_per_second = self.files / elapsed
+        bytes_per_second = self.bytes / elapsed
+        # Files differ wildly in size, so the remaining bytes predict better than the remaining count
+        if bytes_per_second > 0:
+            eta = timedelta(seconds=round((self.total_bytes - self.bytes) / bytes_per_second))
+        else:
+            eta = 'unknown'
+        logging.info(
+            f"Bulk progress: {self.files}/{self.total_files} files "
+            f"({100.0 * self.files / max(self.total_files, 1):.1f}%), "
+            f"{files_per_second:.2f} files/s, {bytes_per_second / 1024 / 1024:.2f} MB/s, ETA {eta}"
+        )
+
+
+def run(input_dir: str, output_path: str, checkpoint_path: str, model_name: str = None,
+        summary_depth: float = 0.3, window: int = BULK_WINDOW, fresh: bool = False,
+        progress_interval: float = BULK_PROGRESS_INTERVAL, max_time: float = JOB_TIME_BUDGET) -> int:
+    """
+    Summarize every supported file under input_dir that the checkpoint does not list yet.
+
+    Args:
+        input_dir (str): Directory to walk
+        output_path (str): JSONL file results are appended to
+        checkpoint_path (str): File recording finished paths and the output length after each
+        model_name (str): Model id or path, the route for summary_depth if None
+        summary_depth (float): Depth of summarization
+        window (int): Files extracted and summarized together
+        fresh (bool): Ignore and overwrite a previous run's output and checkpoint
+        progress_interval (float): Seconds between progress reports
+        max_time (float): Time budget of each document in seconds; not bound by any request timeout
+
+    Returns:
+        int: Files given a result line in this run
+    """
+    from model import get_model_cache
+    from summarie import generate_summary
+
+    if fresh:
+        for path in (output_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    documents = find_documents(input_dir)
+    done, _ = load_checkpoint(checkpoint_path, output_path)
+    todo = [document for document in documents if document.relative_path not in done]
+    logging.info(f"Found {len(documents)} documents in {input_dir}, {len(done)} done before, {len(todo)} to go")
+    if not todo:
+        return 0
+
+    progress = Progress(len(todo), sum(document.size for document in todo), progress_interval)
+    writer = ResultWriter(output_path, checkpoint_path)
+    model_cache = get_model_cache()
+    try:
+        with model_cache.use(model_name or model_cache.model_name_for(summary_depth)) as model:
+            for start in range(0, len(todo), max(1, window)):
+                batch = {document.relative_path: document for document in todo[start:start + max(1, window)]}
+
+                def on_summary(result: Dict):
+                    if result['complete']:
+                        writer.write({'path': result['title'], 'summary': result['content'],
+                                      'truncated': result['truncated']})
+                    else:
+                        writer.write({'path': result['title'], 'error': 'Summarization failed or timed out'},
+                                     failed=True)
+                    progress.advance(batch[result['title']].size)
+
+                generate_summary(model, _extracted(batch, writer, progress), summary_depth,
+                                 max_time=max_time, document_callback=on_summary)
+    finally:
+        writer.close()
+        progress.report()
+    return progress.files
+
+
+def _extracted(batch: Dict[str, SourceFile], writer: ResultWriter, progress: Progress) -> Iterator[Dict]:
+    """Document dictionaries for generate_summary in extraction completion order; empty files are recorded here."""
+    items = ((document.relative_path, document.path, document.file_type) for document in batch.values())
+    for relative_path, text, truncated in extract_documents(items):
+        if not text.strip():
+            writer.write({'path': relative_path, 'error': 'No text extracted'})
+            progress.advance(batch[relative_path].size)
+            continue
+        yield {'name': relative_path, 'content': text, 'truncated': truncated}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize every document under a directory into a JSONL file")
+    parser.add_argument('input_dir')
+    parser.add_argument('--output', default='summaries.jsonl', help="JSONL file results are appended to")
+    parser.add_argument('--checkpoint', help="Resume state, OUTPUT.checkpoint if omitted")
+    parser.add_argument('--model', help="Hugging Face model id or path, the configured route if omitted")
+    parser.add_argument('--summary-depth', type=float, default=0.3)
+    parser.add_argument('--window', type=int, default=BULK_WINDOW, help="Files extracted and summarized together")
+    parser.add_argument('--document-workers', type=int,
+                        help="Documents summarized at once, feeding the batched scheduler")
+    parser.add_argument('--progress-interval', type=float, default=BULK_PROGRESS_INTERVAL)
+    parser.add_argument('--max-time', type=float, default=JOB_TIME_BUDGET,
+                        help="Seconds each document may take, JOB_TIME_BUDGET if omitted")
+    parser.add_argument('--fresh', action='store_true', help="Discard a previous run's output and checkpoint")
+    args = parser.parse_args()
+
+    if args.document_workers:
+        # Read when summarie is imported, which run() does
+        os.environ['SUMMARY_DOCUMENT_WORKERS'] = str(args.document_workers)
+
+    run(
+        input_dir=args.input_dir,
+        output_path=args.output,
+        checkpoint_path=args.checkpoint or f"{args.output}.checkpoint",
+        model_name=args.model,
+        summary_depth=args.summary_depth,
+        window=args.window,
+        fresh=args.fresh,
+        progress_interval=args.progress_interval,
+        max_time=args.max_time
+    )
+
+
+if __name__ == '__main__':
+    main()
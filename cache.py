@@ -0,0 +1,197 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from threading import Lock
+from typing import BinaryIO, Optional, Union
+from cachetools import LRUCache
+from metrics import CACHE_LOOKUPS
+from uploads import UPLOAD_FOLDER
+
+SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', '256'))
+CHUNK_CACHE_SIZE = int(os.getenv('CHUNK_CACHE_SIZE', '4096'))
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', '256'))
+# Disk tier lives under UPLOAD_FOLDER so every gunicorn worker sees it; empty disables it
+SUMMARY_CACHE_DIR = os.getenv('SUMMARY_CACHE_DIR', os.path.join(UPLOAD_FOLDER, 'summary_cache'))
+# Size cap of each namespace on disk; least recently used entries go first
+SUMMARY_CACHE_DISK_MB = float(os.getenv('SUMMARY_CACHE_DISK_MB', '256'))
+# Writes between scans of the disk tier for its size
+SUMMARY_CACHE_PRUNE_EVERY = 64
+
+
+class SummaryCache:
+    """
+    Content-addressed summary cache with an in-memory LRU and an optional on-disk tier.
+
+    Every worker shares the disk tier, so its recency lives in the files themselves:
+    reads bump an entry's mtime, and every SUMMARY_CACHE_PRUNE_EVERY writes the
+    oldest files are deleted until the namespace fits disk_max_bytes.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, disk_dir: Optional[str] = SUMMARY_CACHE_DIR,
+                 disk_max_bytes: float = SUMMARY_CACHE_DISK_MB * 1024 * 1024):
+        self.namespace = namespace
+        self.memory = LRUCache(maxsize=maxsize)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_writes = 0
+        self.disk_dir = os.path.join(disk_dir, namespace) if disk_dir else None
+        if self.disk_dir:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+            except OSError as e:
+                logging.warning(f"Disabling on-disk {namespace} cache: {str(e)}")
+                self.disk_dir = None
+        if self.disk_dir:
+            self._prune_disk()
+
+    @staticmethod
+    def make_key(content: Union[bytes, str, BinaryIO], model_name: str, summary_depth: float) -> str:
+        """
+        Build a cache key from the content hash and the parameters that affect the summary.
+
+        Args:
+            content (bytes/str/file-like): Raw upload bytes, spooled upload stream or chunk text
+            model_name (str): Name of the summarization model
+            summary_depth (float): Requested summary depth
+
+        Returns:
+            str: Hex digest identifying the summary
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8', errors='ignore')
+        if hasattr(content, 'read'):
+            # Hash spooled uploads block by block instead of reading them whole
+            content_hash = hashlib.sha256()
+            content.seek(0)
+            for block in iter(lambda: content.read(1024 * 1024), b''):
+                content_hash.update(block)
+            content.seek(0)
+            digest = content_hash.hexdigest()
+        else:
+            digest = hashlib.sha256(content).hexdigest()
+        return hashlib.sha256(f"{digest}|{model_name}|{summary_depth:.2f}".encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached summary for key, promoting disk hits into memory."""
+        with self.lock:
+            summary = self.memory.get(key)
+        if summary is None and self.disk_dir:
+            try:
+                path = self._disk_path(key)
+                with open(path, 'r', encoding='utf-8') as f:
+                    summary = json.load(f).get('summary')
+                if summary is not None:
+                    # Recency for pruning, which other workers see too
+                    os.utime(path)
+                    with self.lock:
+                        self.memory[key] = summary
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Error reading {self.namespace} cache entry {key}: {str(e)}")
+
+        with self.lock:
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_LOOKUPS.inc(cache=self.namespace, result='miss' if summary is None else 'hit')
+        return summary
+
+    def put(self, key: str, summary: str):
+        """Store a summary in memory and, when enabled, atomically on disk."""
+        if not summary:
+            return
+        with self.lock:
+            self.memory[key] = summary
+        if not self.disk_dir:
+            return
+        try:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'summary': summary}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(f"Error writing {self.namespace} cache entry {key}: {str(e)}")
+            return
+
+        with self.lock:
+            self.disk_writes += 1
+            prune = self.disk_writes % SUMMARY_CACHE_PRUNE_EVERY == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the least recently used files until the disk tier fits disk_max_bytes."""
+        entries, total = [], 0
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.disk_max_bytes:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Another worker pruned it first
+                pass
+            total -= size
+            removed += 1
+        logging.info(f"Pruned {removed} {self.namespace} cache entries from disk")
+
+    def hit_ratio(self) -> float:
+        """Fraction of lookups served from cache."""
+        with self.lock:
+            total = self.hits + self.misses
+            return self.hits / total if total else 0.0
+
+
+# Process-wide cache instances
+_cache_lock = Lock()
+_summary_cache = None
+_chunk_cache = None
+_ocr_cache = None
+
+def get_summary_cache() -> SummaryCache:
+    """Get or create the document-level summary cache."""
+    global _summary_cache
+    with _cache_lock:
+        if _summary_cache is None:
+            _summary_cache = SummaryCache('documents', SUMMARY_CACHE_SIZE)
+        return _summary_cache
+
+def get_chunk_cache() -> SummaryCache:
+    """Get or create the chunk-level summary cache."""
+    global _chunk_cache
+    with _cache_lock:
+        if _chunk_cache is None:
+            _chunk_cache = SummaryCache('chunks', CHUNK_CACHE_SIZE)
+        return _chunk_cache
+
+def get_ocr_cache() -> SummaryCache:
+    """Get or create the cache of recognized image text, keyed by image hash."""
+    global _ocr_cache
+    with _cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = SummaryCache('ocr', OCR_CACHE_SIZE)
+        return _ocr_cache
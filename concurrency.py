@@ -0,0 +1,290 @@
+import os
+import gc
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from threading import Condition, Lock
+from typing import Iterable, Optional
+import psutil
+
+# Summarization requests running at once per worker; the rest wait in a bounded queue
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', '4'))
+SUMMARY_QUEUE_SIZE = int(os.getenv('SUMMARY_QUEUE_SIZE', '8'))
+# Longest a queued request waits for a slot before it is turned away
+SUMMARY_QUEUE_TIMEOUT = float(os.getenv('SUMMARY_QUEUE_TIMEOUT', '30'))
+SUMMARY_RETRY_AFTER = int(os.getenv('SUMMARY_RETRY_AFTER', '10'))
+
+# Memory that request work may use on top of the baseline: the interpreter, libraries
+# and loaded model weights, which are resident whether or not anything is running
+MAX_MEMORY_MB = int(os.getenv('MAX_MEMORY_MB', str(int(1.2 * 1024))))
+# Above this share of MAX_MEMORY_MB the scheduler stops batching and runs one chunk at a time
+MEMORY_PRESSURE_PERCENT = float(os.getenv('MEMORY_PRESSURE_PERCENT', '80'))
+# Request cost estimate: a fixed base, the upload size times a per-format
+# parsing overhead, then the extracted text's tokens
+MEMORY_REQUEST_BASE_MB = float(os.getenv('MEMORY_REQUEST_BASE_MB', '16'))
+MEMORY_PER_TOKEN_BYTES = int(os.getenv('MEMORY_PER_TOKEN_BYTES', '256'))
+MEMORY_FORMAT_FACTORS = {
+    'pdf': 3.0,
+    'docx': 8.0,
+    'doc': 8.0,
+    'xlsx': 10.0,
+    'xls': 10.0,
+    'pptx': 6.0,
+    'ppt': 6.0,
+    'png': 12.0,
+    'jpg': 12.0,
+    'jpeg': 12.0,
+    'tif': 12.0,
+    'tiff': 12.0
+}
+MEMORY_DEFAULT_FORMAT_FACTOR = 2.0
+# RSS drops without anyone notifying the admission queue, so waiters re-check this often
+MEMORY_POLL_INTERVAL = 0.5
+
+
+class QueueFullError(Exception):
+    """Raised when no running or queued slot is free; answer with 429 and Retry-After."""
+
+
+class MemoryPressureError(QueueFullError):
+    """Raised when a request's estimated memory does not fit before its queue timeout."""
+
+
+_baseline_lock = Lock()
+_baseline_bytes: Optional[float] = None
+
+
+def _process_rss() -> float:
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def mark_memory_baseline():
+    """Take the current RSS as the baseline if none is set yet; call before loading a model."""
+    global _baseline_bytes
+    with _baseline_lock:
+        if _baseline_bytes is None:
+            _baseline_bytes = _process_rss()
+
+
+def adjust_memory_baseline(delta: float):
+    """Count delta bytes of long-lived memory, such as loaded or unloaded weights, as baseline."""
+    global _baseline_bytes
+    with _baseline_lock:
+        if _baseline_bytes is None:
+            _baseline_bytes = _process_rss()
+        _baseline_bytes = max(0.0, _baseline_bytes + delta)
+
+
+def memory_baseline() -> float:
+    """Bytes of RSS not attributed to request work, 0 until a model has been loaded."""
+    return _baseline_bytes or 0.0
+
+
+class MemoryManager:
+    """
+    Manages memory usage and cleanup for the application.
+
+    Thresholds apply to request memory: RSS above the baseline, so that model
+    weights resident for the life of the process never count as pressure.
+    """
+
+    def __init__(self, threshold_percent: float = 90.0, pressure_percent: float = MEMORY_PRESSURE_PERCENT):
+        self.threshold_percent = threshold_percent
+        self.memory_threshold = (MAX_MEMORY_MB * 1024 * 1024 * threshold_percent) / 100.0
+        self.pressure_threshold = (MAX_MEMORY_MB * 1024 * 1024 * pressure_percent) / 100.0
+
+    def get_memory_usage(self) -> float:
+        """Get current memory usage in bytes."""
+        return _process_rss()
+
+    def get_request_usage(self) -> float:
+        """Get the bytes in use above the baseline, i.e. by request work."""
+        return max(0.0, self.get_memory_usage() - memory_baseline())
+
+    def check_memory(self) -> bool:
+        """Check if request memory is below threshold."""
+        return self.get_request_usage() < self.memory_threshold
+
+    def has_room(self, projected_bytes: float) -> bool:
+        """Check if request memory plus projected_bytes stays below threshold."""
+        return self.get_request_usage() + projected_bytes < self.memory_threshold
+
+    def under_pressure(self) -> bool:
+        """Check if request memory has crossed the pressure threshold, where work should shrink."""
+        return self.get_request_usage() >= self.pressure_threshold
+
+    @contextmanager
+    def monitor_memory(self, operation_name: str):
+        """Context manager to monitor memory usage during operations."""
+        start_mem = self.get_memory_usage()
+        try:
+            yield
+        finally:
+            end_mem = self.get_memory_usage()
+            diff_mem = end_mem - start_mem
+            logging.info(
+                f"Memory usage for {operation_name}: "
+                f"Start: {start_mem / 1024 / 1024:.2f}MB, "
+                f"End: {end_mem / 1024 / 1024:.2f}MB, "
+                f"Diff: {diff_mem / 1024 / 1024:.2f}MB"
+            )
+
+    def cleanup(self):
+        """Perform memory cleanup operations."""
+        gc.collect()
+        # Only touch CUDA if torch is already loaded; extractive-only workers never import it
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def estimate_upload_cost(uploads: Iterable) -> int:
+    """Bytes a request is expected to need to parse its uploads."""
+    cost = MEMORY_REQUEST_BASE_MB * 1024 * 1024
+    for upload in uploads:
+        file_type = upload.name.split('.')[-1].lower()
+        cost += upload.size * MEMORY_FORMAT_FACTORS.get(file_type, MEMORY_DEFAULT_FORMAT_FACTOR)
+    return int(cost)
+
+
+def estimate_text_cost(text: str) -> int:
+    """Bytes needed to chunk and summarize an extracted text, at about four characters per token."""
+    return (len(text) // 4 + 1) * MEMORY_PER_TOKEN_BYTES
+
+
+class Reservation:
+    """One admitted request's running slot and its share of the memory budget."""
+
+    def __init__(self, admission_control: 'AdmissionControl', cost: int):
+        self.admission_control = admission_control
+        self.cost = cost
+        self.released = False
+
+    def grow(self, cost: int):
+        """Add to the reserved memory once more is known, e.g. the extracted text's size; never waits."""
+        with self.admission_control.condition:
+            if not self.released:
+                self.cost += cost
+                self.admission_control.reserved += cost
+
+    def release(self):
+        """Give the slot and memory back; safe to call more than once."""
+        with self.admission_control.condition:
+            if self.released:
+                return
+            self.released = True
+            self.admission_control.active -= 1
+            self.admission_control.reserved -= self.cost
+            self.admission_control.condition.notify_all()
+
+
+class AdmissionControl:
+    """
+    Bounds concurrent summarization work and the queue in front of it.
+
+    Generation itself is serialized by the inference scheduler; this caps how
+    many requests extract, chunk and wait on it at once so memory and latency
+    stay bounded, and turns away the overflow instead of letting it pile up.
+
+    Each request also reserves its estimated memory cost. A request is admitted
+    only while RSS plus every reservation plus its own cost stays under the
+    MemoryManager threshold; a request that arrives when nothing else is
+    running is always admitted, since waiting could not free anything.
+    """
+
+    def __init__(self, max_active: int = SUMMARY_CONCURRENCY, max_waiting: int = SUMMARY_QUEUE_SIZE,
+                 wait_timeout: float = SUMMARY_QUEUE_TIMEOUT, memory_manager: Optional[MemoryManager] = None):
+        self.max_active = max(1, max_active)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout
+        self.memory_manager = memory_manager or MemoryManager()
+        self.active = 0
+        self.waiting = 0
+        self.reserved = 0
+        self.condition = Condition()
+
+    def _fits(self, cost: int) -> bool:
+        return self.active == 0 or self.memory_manager.has_room(self.reserved + cost)
+
+    def acquire(self, cost: int = 0, wait_timeout: Optional[float] = None, bounded_queue: bool = True) -> Reservation:
+        """
+        Take one running slot and reserve cost bytes, waiting in the queue if either is short.
+
+        Args:
+            cost (int): Estimated bytes the request will need
+            wait_timeout (float): Seconds to wait, self.wait_timeout if None
+            bounded_queue (bool): Count against max_waiting; callers with their own queue pass False
+
+        Returns:
+            Reservation: Release it when the request finishes
+
+        Raises:
+            QueueFullError: If the queue is full or no slot frees up in time
+            MemoryPressureError: If a slot is free but the memory does not fit in time
+        """
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        with self.condition:
+            if self.active >= self.max_active or not self._fits(cost):
+                if bounded_queue and self.waiting >= self.max_waiting:
+                    raise QueueFullError("Summarization queue is full")
+                self.waiting += 1
+                try:
+                    self._wait(cost, time.monotonic() + wait_timeout)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.reserved += cost
+        return Reservation(self, cost)
+
+    def _wait(self, cost: int, deadline: float):
+        collected = False
+        while True:
+            if self.active < self.max_active:
+                if self._fits(cost):
+                    return
+                # Short on memory alone: collect garbage once before waiting on other requests
+                if not collected:
+                    collected = True
+                    self.memory_manager.cleanup()
+                    continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if self.active < self.max_active:
+                    raise MemoryPressureError("Not enough memory to start summarization")
+                raise QueueFullError("Timed out waiting for a summarization slot")
+            self.condition.wait(min(remaining, MEMORY_POLL_INTERVAL))
+
+    @contextmanager
+    def slot(self, cost: int = 0, wait_timeout: Optional[float] = None, bounded_queue: bool = True):
+        """Hold one running slot and cost bytes for the duration of the block."""
+        reservation = self.acquire(cost, wait_timeout, bounded_queue)
+        try:
+            yield reservation
+        finally:
+            reservation.release()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_active': self.max_active,
+                'reserved_mb': round(self.reserved / 1024 / 1024, 1),
+                'rss_mb': round(self.memory_manager.get_memory_usage() / 1024 / 1024, 1),
+                'baseline_mb': round(memory_baseline() / 1024 / 1024, 1),
+                'max_memory_mb': MAX_MEMORY_MB
+            }
+
+
+# Singleton instance creation
+_admission_lock = Lock()
+_admission_control = None
+
+def get_admission_control() -> AdmissionControl:
+    """Get or create the process-wide admission control."""
+    global _admission_control
+    with _admission_lock:
+        if _admission_control is None:
+            _admission_control = AdmissionControl()
+        return _admission_control
@@ -0,0 +1,145 @@
+import os
+import re
+import zlib
+from collections import Counter
+from typing import List, Set, Tuple
+import numpy as np
+
+# A normalized line seen this many times in one document is boilerplate; only its first copy is kept
+DEDUP_LINE_MIN_REPEATS = int(os.getenv('DEDUP_LINE_MIN_REPEATS', '3'))
+# Longer lines are real content even when repeated
+DEDUP_LINE_MAX_CHARS = int(os.getenv('DEDUP_LINE_MAX_CHARS', '200'))
+# Estimated Jaccard similarity of word shingles above which a chunk repeats an earlier one
+DEDUP_CHUNK_SIMILARITY = float(os.getenv('DEDUP_CHUNK_SIMILARITY', '0.85'))
+DEDUP_SHINGLE_WORDS = 5
+DEDUP_NUM_HASHES = 64
+
+# Page numbers are the only lines matched regardless of their numbers. A line saying "Page 3"
+# or "Page 3 of 40" always is one; a bare "3", "- 3 -", "3/40" or "3 of 40" only where it opens
+# or closes a page and counts up with the pages around it, since it may as well be a table
+# cell or a date. Any other lines differing in a number, like table rows, stay distinct
+_PAGE_NUMBER_PATTERN = re.compile(r'^[-\u2013\s]*page\s*\d+(\s*(of|/)\s*\d+)?[-\u2013\s]*$')
+_BARE_PAGE_NUMBER_PATTERN = re.compile(r'^[-\u2013\s]*(\d+)(\s*(of|/)\s*\d+)?[-\u2013\s]*$')
+_PAGE_NUMBER_KEY = '<page number>'
+_WORD_PATTERN = re.compile(r'\w+')
+# Mersenne prime modulus for the universal hash family; shingle hashes are 32-bit, so products fit in uint64
+_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+_HASH_A = _rng.randint(1, 1 << 31, size=DEDUP_NUM_HASHES).astype(np.uint64)
+_HASH_B = _rng.randint(0, 1 << 31, size=DEDUP_NUM_HASHES).astype(np.uint64)
+
+
+def _normalize_line(line: str) -> str:
+    """Case- and spacing-insensitive form of a line; every page number line shares one form."""
+    line = ' '.join(line.lower().split())
+    if _PAGE_NUMBER_PATTERN.match(line):
+        return _PAGE_NUMBER_KEY
+    return line
+
+
+def _bare_page_numbers(pages: List[List[str]]) -> Set[Tuple[int, int]]:
+    """
+    (page, line) positions of bare page numbers in text split into pages by form feeds.
+
+    Only the first and last non-blank line of a page can hold one, and only if its
+    number goes up by the page distance from the nearest page with a number at the same edge.
+    """
+    found = set()
+    if len(pages) < 2:
+        return found
+    for edge in (0, -1):
+        candidates = []
+        for page_index, lines in enumerate(pages):
+            filled = [index for index, line in enumerate(lines) if line.strip()]
+            if not filled:
+                continue
+            line_index = filled[edge]
+            match = _BARE_PAGE_NUMBER_PATTERN.match(lines[line_index].lower())
+            if match:
+                candidates.append((page_index, line_index, int(match.group(1))))
+        for (page, line, number), (next_page, next_line, next_number) in zip(candidates, candidates[1:]):
+            if next_number - number == next_page - page:
+                found.update({(page, line), (next_page, next_line)})
+    return found
+
+
+def drop_repeated_lines(text: str, min_repeats: int = DEDUP_LINE_MIN_REPEATS,
+                        max_chars: int = DEDUP_LINE_MAX_CHARS) -> Tuple[str, str]:
+    """
+    Remove running headers, footers, page numbers and repeated rows from extracted text.
+
+    Must run before line breaks are collapsed. Short lines whose normalized form
+    occurs at least min_repeats times keep only their first occurrence. Form feeds,
+    which end every PDF page, tell where bare page numbers can be; the text comes
+    back with them turned into line breaks.
+
+    Args:
+        text (str): Extracted document text with its line breaks
+        min_repeats (int): Occurrences that make a line boilerplate
+        max_chars (int): Lines longer than this are never dropped
+
+    Returns:
+        Tuple[str, str]: Text without the repeats, and the removed lines joined for reporting
+    """
+    pages = [page.splitlines() for page in text.split('\f')]
+    page_numbers = _bare_page_numbers(pages)
+    lines, keys = [], []
+    for page_index, page in enumerate(pages):
+        for line_index, line in enumerate(page):
+            lines.append(line)
+            if (page_index, line_index) in page_numbers:
+                keys.append(_PAGE_NUMBER_KEY)
+            else:
+                keys.append(_normalize_line(line) if 0 < len(line.strip()) <= max_chars else None)
+    counts = Counter(key for key in keys if key)
+    repeated = {key for key, count in counts.items() if count >= min_repeats}
+    if not repeated:
+        return text, ''
+
+    kept, removed, seen = [], [], set()
+    for line, key in zip(lines, keys):
+        if key in repeated:
+            if key in seen:
+                removed.append(line)
+                continue
+            seen.add(key)
+        kept.append(line)
+    return '\n'.join(kept), '\n'.join(removed)
+
+
+def minhash_signature(text: str, shingle_words: int = DEDUP_SHINGLE_WORDS) -> np.ndarray:
+    """MinHash signature of a text's word shingles; matching positions estimate Jaccard similarity."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_words:
+        shingles = [' '.join(words)]
+    else:
+        shingles = [' '.join(words[i:i + shingle_words]) for i in range(len(words) - shingle_words + 1)]
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    return ((np.outer(hashes, _HASH_A) + _HASH_B) % _PRIME).min(axis=0)
+
+
+def collapse_near_duplicates(chunks: List[str], threshold: float = DEDUP_CHUNK_SIMILARITY) -> Tuple[List[str], List[str]]:
+    """
+    Drop chunks whose shingles nearly match an earlier chunk's.
+
+    Args:
+        chunks (List[str]): Chunks in document order
+        threshold (float): Estimated Jaccard similarity at which a chunk is a duplicate
+
+    Returns:
+        Tuple[List[str], List[str]]: Kept chunks in order, and the dropped ones
+    """
+    if len(chunks) < 2:
+        return chunks, []
+
+    kept, dropped = [], []
+    # Signatures of the kept chunks, filled row by row
+    signatures = np.empty((len(chunks), DEDUP_NUM_HASHES), dtype=np.uint64)
+    for chunk in chunks:
+        signature = minhash_signature(chunk)
+        if kept and (signatures[:len(kept)] == signature).mean(axis=1).max() >= threshold:
+            dropped.append(chunk)
+            continue
+        signatures[len(kept)] = signature
+        kept.append(chunk)
+    return kept, dropped
@@ -0,0 +1,171 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Callable, FrozenSet, List
+import numpy as np
+import nltk
+
+_WORD_PATTERN = re.compile(r'[^\W\d_]{2,}')
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# Share of a document's words kept by extractive_summary at each summary depth
+EXTRACTIVE_DEPTH_RATIOS = {0.0: 0.05, 1.0: 0.15, 2.0: 0.3, 3.0: 0.4, 4.0: 0.6}
+EXTRACTIVE_MIN_SENTENCES = 3
+
+
+@lru_cache(maxsize=8)
+def _stop_words(language: str) -> FrozenSet[str]:
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words(language))
+    except LookupError:
+        logging.warning(f"NLTK stopwords for {language} unavailable, ranking without them")
+        return frozenset()
+
+
+def _tfidf(sentences: List[str], language: str = 'english'):
+    """
+    L2-normalised TF-IDF sentence vectors as sparse (rows, cols, values) arrays.
+
+    Returns:
+        tuple: Row indices, term indices, weights and the vocabulary size
+    """
+    stop_words = _stop_words(language)
+    vocabulary = {}
+    rows, cols = [], []
+    for index, sentence in enumerate(sentences):
+        for word in _WORD_PATTERN.findall(sentence.lower()):
+            if word not in stop_words:
+                rows.append(index)
+                cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    n, vocabulary_size = len(sentences), max(len(vocabulary), 1)
+    # Collapse repeated (sentence, term) pairs into term counts
+    pairs, counts = np.unique(
+        np.array(rows, dtype=np.int64) * vocabulary_size + np.array(cols, dtype=np.int64),
+        return_counts=True
+    )
+    rows, cols = np.divmod(pairs, vocabulary_size)
+
+    document_frequency = np.bincount(cols, minlength=vocabulary_size)
+    idf = np.log((1.0 + n) / (1.0 + document_frequency)) + 1.0
+    values = counts * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n))
+    values = values / norms[rows]
+    return rows, cols, values, vocabulary_size
+
+
+def textrank_scores(sentences: List[str], language: str = 'english', damping: float = 0.85,
+                    iterations: int = 50, tolerance: float = 1e-6) -> np.ndarray:
+    """
+    Rank sentences with TextRank over their TF-IDF cosine similarity graph.
+
+    The similarity matrix is never materialised: each power iteration multiplies
+    by X and X^T through the sparse TF-IDF entries, so memory and time stay
+    linear in the number of words even for reports with tens of thousands of sentences.
+
+    Args:
+        sentences (List[str]): Sentences in document order
+        language (str): NLTK stopword language
+        damping (float): PageRank damping factor
+        iterations (int): Maximum power iterations
+        tolerance (float): L1 change at which the iteration stops
+
+    Returns:
+        np.ndarray: One score per sentence, summing to 1
+    """
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+
+    rows, cols, values, vocabulary_size = _tfidf(sentences, language)
+    self_similarity = np.bincount(rows, weights=values ** 2, minlength=n)
+
+    def similarity_times(vector: np.ndarray) -> np.ndarray:
+        # (X X^T - diag) @ vector, i.e. similarity to every other sentence
+        term_weights = np.bincount(cols, weights=values * vector[rows], minlength=vocabulary_size)
+        return np.bincount(rows, weights=values * term_weights[cols], minlength=n) - self_similarity * vector
+
+    degree = similarity_times(np.ones(n))
+    connected = degree > 1e-12
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        spread = similarity_times(np.divide(scores, degree, out=np.zeros(n), where=connected))
+        updated = (1.0 - damping) / n + damping * spread
+        updated /= updated.sum()
+        converged = np.abs(updated - scores).sum() < tolerance
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def split_sentences(text: str, language: str = 'english') -> List[str]:
+    """Split text with the NLTK sentence tokenizer, or on end punctuation if its data is missing."""
+    try:
+        return nltk.sent_tokenize(text, language=language)
+    except LookupError:
+        return [sentence for sentence in _SENTENCE_END_PATTERN.split(text) if sentence.strip()]
+
+
+def _top_sentences(sentences: List[str], lengths: np.ndarray, budget: int, language: str,
+                   min_sentences: int = 1) -> np.ndarray:
+    """Indices, in document order, of the best ranked sentences whose lengths fit budget."""
+    scores = textrank_scores(sentences, language)
+    ranked = np.argsort(-scores, kind='stable')
+    # Take sentences from the top of the ranking until the budget is spent
+    count = max(int((np.cumsum(lengths[ranked]) <= budget).sum()), min_sentences)
+    return np.sort(ranked[:count])
+
+
+def select_sentences(text: str, token_budget: int, count_tokens: Callable[[List[str]], List[int]],
+                     language: str = 'english') -> str:
+    """
+    Keep the highest ranked sentences of text that fit token_budget, in document order.
+
+    Args:
+        text (str): Preprocessed document text
+        token_budget (int): Maximum tokens to keep
+        count_tokens (Callable): Returns the token count of each sentence in a list
+        language (str): Sentence tokenizer and stopword language
+
+    Returns:
+        str: Filtered text, or text unchanged if it already fits
+    """
+    sentences = split_sentences(text, language)
+    lengths = np.array(count_tokens(sentences), dtype=np.int64)
+    total = int(lengths.sum())
+    if total <= token_budget or len(sentences) < 2:
+        return text
+
+    keep = _top_sentences(sentences, lengths, token_budget, language)
+    logging.info(
+        f"Extractive pre-filter kept {len(keep)}/{len(sentences)} sentences "
+        f"({int(lengths[keep].sum())}/{total} tokens)"
+    )
+    return ' '.join(sentences[index] for index in keep)
+
+
+def extractive_summary(text: str, summary_depth: float = 0.3, language: str = 'english') -> str:
+    """
+    Summarize text by picking its highest ranked sentences, without a neural model.
+
+    Args:
+        text (str): Document text
+        summary_depth (float): Summary depth from 0.0 to 4.0; sets the share of words kept
+        language (str): Sentence tokenizer and stopword language
+
+    Returns:
+        str: Selected sentences in document order
+    """
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    sentences = split_sentences(text, language)
+    if len(sentences) <= EXTRACTIVE_MIN_SENTENCES:
+        return text
+
+    ratio = EXTRACTIVE_DEPTH_RATIOS[min(EXTRACTIVE_DEPTH_RATIOS, key=lambda depth: abs(depth - summary_depth))]
+    lengths = np.array([len(sentence.split()) for sentence in sentences], dtype=np.int64)
+    keep = _top_sentences(
+        sentences, lengths, int(lengths.sum() * ratio), language, min_sentences=EXTRACTIVE_MIN_SENTENCES
+    )
+    return ' '.join(sentences[index] for index in keep)
@@ -0,0 +1,709 @@
+import os
+import io
+import base64
+import codecs
+import shutil
+import signal
+import logging
+import tempfile
+import threading
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from threading import Lock
+from typing import BinaryIO, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from metrics import EXTRACTION_SECONDS
+from concurrency import MAX_MEMORY_MB, MEMORY_PER_TOKEN_BYTES
+
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '8'))
+PDF_PAGE_TIMEOUT = float(os.getenv('PDF_PAGE_TIMEOUT', '10'))
+# Smaller documents are cheaper to parse in one worker than to fan out by page range
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '16'))
+# Whole-file extraction for multi-file requests runs in one process pool per format
+# group, so slow OCR can only ever occupy its own workers
+EXTRACTION_FORMAT_GROUPS = {
+    'pdf': 'pdf',
+    'docx': 'office',
+    'doc': 'office',
+    'xlsx': 'office',
+    'xls': 'office',
+    'pptx': 'office',
+    'ppt': 'office',
+    'png': 'ocr',
+    'jpg': 'ocr',
+    'jpeg': 'ocr',
+    'tif': 'ocr',
+    'tiff': 'ocr'
+}
+EXTRACTION_GROUP_WORKERS = {
+    'pdf': PDF_WORKERS,
+    'office': int(os.getenv('EXTRACTION_OFFICE_WORKERS', str(max(1, (os.cpu_count() or 1) // 2)))),
+    'ocr': int(os.getenv('EXTRACTION_OCR_WORKERS', '1'))
+}
+EXTRACTION_FILE_TIMEOUT = float(os.getenv('EXTRACTION_FILE_TIMEOUT', '120'))
+# Extraction stops once a document has produced this many characters or segments
+# (rows, paragraphs, slides, pages); 0 disables a limit. By default a document may
+# grow to the longest text whose summarization cost estimate fits MAX_MEMORY_MB
+EXTRACTION_MAX_CHARS = int(os.getenv(
+    'EXTRACTION_MAX_CHARS', str(MAX_MEMORY_MB * 1024 * 1024 // MEMORY_PER_TOKEN_BYTES * 4)
+))
+EXTRACTION_MAX_SEGMENTS = int(os.getenv('EXTRACTION_MAX_SEGMENTS', '1000000'))
+# Plain text is decoded this many bytes at a time
+TEXT_BLOCK_SIZE = 1024 * 1024
+
+def extract_text_from_document(content, file_type):
+    """
+    Enhanced text extraction with comprehensive error handling for multiple file types.
+
+    Args:
+        content (bytes/str/file-like): Document content, base64 string or seekable binary stream
+        file_type (str): Type of document (pdf, docx, xlsx, etc.)
+
+    Returns:
+        str: Extracted text content or empty string if extraction fails
+    """
+    return extract_bounded_text(content, file_type)[0]
+
+def extract_bounded_text(content, file_type) -> Tuple[str, bool]:
+    """
+    Extract a document's text like extract_text_from_document, reporting whether the size budget cut it.
+
+    Returns:
+        Tuple[str, bool]: Extracted text, empty if extraction fails, and True if the text
+            stops at EXTRACTION_MAX_CHARS or EXTRACTION_MAX_SEGMENTS
+    """
+    start_time = time.time()
+    try:
+        # Convert content to bytes if it's a base64 string
+        if isinstance(content, str):
+            try:
+                content = base64.b64decode(content)
+            except Exception:
+                # If base64 decoding fails, treat as plain text
+                return content, False
+
+        # Parsers read from a seekable stream so spooled uploads are never loaded whole
+        if isinstance(content, (bytes, bytearray)):
+            content = io.BytesIO(content)
+
+        # The text is built once from the bounded segment stream
+        segments = iter_document_segments(content, file_type)
+        return "".join(segments), segments.truncated
+
+    except Exception as e:
+        logging.error(f"Error extracting text from {file_type} file: {str(e)}")
+        return "", False
+    finally:
+        EXTRACTION_SECONDS.observe(time.time() - start_time, file_type=file_type_label(file_type))
+
+def iter_document_segments(content, file_type: str, max_chars: int = EXTRACTION_MAX_CHARS,
+                           max_segments: int = EXTRACTION_MAX_SEGMENTS) -> 'BoundedSegments':
+    """
+    Yield a document's text as the format's natural segments, within a size budget.
+
+    Segments (pages, paragraphs, sheet rows, slides, text blocks) end with their
+    own separators, so joining them reproduces the document text. The parser stops
+    reading as soon as the budget is spent, and a parse error keeps whatever was
+    yielded before it.
+
+    Args:
+        content: Seekable binary stream
+        file_type (str): Type of document (pdf, docx, xlsx, etc.)
+        max_chars (int): Characters to yield at most, 0 for no limit
+        max_segments (int): Segments to yield at most, 0 for no limit
+
+    Returns:
+        BoundedSegments: Text segments in document order; its truncated attribute
+            tells, once iterated, whether the budget cut the document short
+    """
+    file_type = file_type.lower()
+    content.seek(0)
+    segments = _SEGMENT_EXTRACTORS.get(file_type, _iter_plain_text)(content)
+    return BoundedSegments(segments, file_type, max_chars, max_segments)
+
+
+class BoundedSegments:
+    """Iterator over a document's segments that stops at a size budget and records whether it did."""
+
+    def __init__(self, segments: Iterator[str], file_type: str, max_chars: int = EXTRACTION_MAX_CHARS,
+                 max_segments: int = EXTRACTION_MAX_SEGMENTS):
+        self.truncated = False
+        self._segments = self._bounded(segments, file_type, max_chars, max_segments)
+
+    def __iter__(self) -> 'BoundedSegments':
+        return self
+
+    def __next__(self) -> str:
+        return next(self._segments)
+
+    def close(self):
+        self._segments.close()
+
+    def _bounded(self, segments: Iterator[str], file_type: str, max_chars: int,
+                 max_segments: int) -> Iterator[str]:
+        chars = count = 0
+        try:
+            for segment in segments:
+                if not segment:
+                    continue
+                if max_chars and chars + len(segment) > max_chars:
+                    self.truncated = True
+                    yield segment[:max_chars - chars]
+                    logging.warning(f"{file_type} extraction stopped at the {max_chars} character budget")
+                    return
+                yield segment
+                chars += len(segment)
+                count += 1
+                if max_segments and count >= max_segments:
+                    # Only a segment left unread makes the budget a cut
+                    self.truncated = next(segments, None) is not None
+                    if self.truncated:
+                        logging.warning(f"{file_type} extraction stopped at the {max_segments} segment budget")
+                    return
+        except _PageTimeout:
+            raise
+        except Exception as e:
+            logging.error(f"{file_type.upper()} text extraction error: {str(e)}")
+        finally:
+            close = getattr(segments, 'close', None)
+            if close is not None:
+                close()
+
+
+def register_extractor(file_types: Iterable[str], segments: Callable[[BinaryIO], Iterator[str]]):
+    """
+    Register a segment extractor for file types, replacing any existing one.
+
+    Args:
+        file_types (Iterable[str]): Lower-case file extensions
+        segments (Callable): Takes a seekable binary stream and yields text segments;
+            it must be a top-level function to run in the extraction process pools
+    """
+    for file_type in file_types:
+        _SEGMENT_EXTRACTORS[file_type] = segments
+
+
+def supported_file_types() -> List[str]:
+    """Lower-case file extensions that have a registered extractor."""
+    return sorted(_SEGMENT_EXTRACTORS)
+
+
+def file_type_label(file_type) -> str:
+    """Metric label for a client-supplied file type: a supported extension or 'other'."""
+    file_type = str(file_type).lower()
+    return file_type if file_type in _SEGMENT_EXTRACTORS else 'other'
+
+
+def _iter_plain_text(content) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    for block in iter(lambda: content.read(TEXT_BLOCK_SIZE), b''):
+        yield decoder.decode(block)
+    yield decoder.decode(b'', final=True)
+
+def _iter_pdf_text(content) -> Iterator[str]:
+    yield from iter_pdf_pages(content)
+
+class _PageTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _page_deadline(seconds: float):
+    """Interrupt a page that takes longer than ``seconds``; only possible on a process's main thread."""
+    if seconds <= 0 or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise_timeout(signum, frame):
+        raise _PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract_pdf_page_range(source, first_page: int, last_page: int, page_timeout: float,
+                            deadline: Optional[float] = None) -> Tuple[List[str], List[int]]:
+    """
+    Extract the text of pages [first_page, last_page) one page at a time.
+
+    Runs inside the PDF process pool, with ``source`` as a file path or an open
+    stream. A page that exceeds ``page_timeout`` yields an empty string instead
+    of stalling the document, and once ``deadline`` (a time.time() value) has
+    passed the remaining pages are skipped. Pages without a text layer are only
+    reported: OCR runs in its own pool, so tesseract never holds a PDF worker.
+
+    Returns:
+        Tuple[List[str], List[int]]: Text of each page in the range, in page order, and the
+            page numbers of scanned pages to recognize
+    """
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
+    from ocr import OCR_PDF_MIN_CHARS, OCR_SCANNED_PDFS
+
+    fp = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        document = PDFDocument(PDFParser(fp))
+        resource_manager = PDFResourceManager(caching=True)
+        texts, scanned = [], []
+        for page_number, page in enumerate(PDFPage.create_pages(document)):
+            if page_number < first_page:
+                continue
+            if page_number >= last_page:
+                break
+            limit = page_timeout
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logging.warning(f"PDF extraction ran out of time at page {page_number + 1}, skipping the rest")
+                    break
+                limit = min(limit, remaining) if limit > 0 else remaining
+
+            output = io.StringIO()
+            device = TextConverter(resource_manager, output, laparams=LAParams())
+            try:
+                with _page_deadline(limit):
+                    PDFPageInterpreter(resource_manager, device).process_page(page)
+                    text = output.getvalue()
+                if OCR_SCANNED_PDFS and len(text.strip()) < OCR_PDF_MIN_CHARS:
+                    # No text layer: a scanned page
+                    scanned.append(page_number)
+                texts.append(text)
+            except _PageTimeout:
+                logging.warning(f"PDF page {page_number + 1} exceeded {limit:.1f}s, skipping")
+                # Keep the page break so the pages after it stay delimited
+                texts.append("\f")
+            finally:
+                device.close()
+        return texts, scanned
+    finally:
+        if fp is not source:
+            fp.close()
+
+
+def _ocr_scanned_page(path: str, page_number: int, timeout: float) -> str:
+    """Recognize one scanned PDF page inside the OCR pool, giving up after timeout seconds."""
+    from ocr import ocr_pdf_page
+
+    try:
+        with _page_deadline(timeout):
+            text = ocr_pdf_page(path, page_number)
+        # Ends with a form feed like every page pdfminer extracts
+        return text + "\f" if text.strip() else ""
+    except _PageTimeout:
+        logging.warning(f"OCR of scanned PDF page {page_number + 1} exceeded {timeout}s, skipping")
+    except Exception as e:
+        logging.warning(f"OCR of scanned PDF page {page_number + 1} failed: {str(e)}")
+    return ""
+
+
+def _with_scanned_pages(path: str, first_page: int, pages: List[str], scanned: List[int]) -> Iterator[str]:
+    """Yield pages in order, with the scanned ones replaced by their text from the OCR pool."""
+    submitted = {
+        page_number: _submit_extraction('ocr', _ocr_scanned_page, path, page_number, PDF_PAGE_TIMEOUT)
+        for page_number in scanned
+    }
+    try:
+        for page_number, text in enumerate(pages, first_page):
+            if page_number in submitted:
+                future, pool = submitted[page_number]
+                try:
+                    text = _task_result(future, pool, 'ocr', PDF_PAGE_TIMEOUT + 30) or text
+                except Exception as e:
+                    logging.error(f"OCR of scanned PDF page {page_number + 1} failed: {str(e)}")
+            yield text
+    finally:
+        for future, _ in submitted.values():
+            future.cancel()
+
+
+def _pdf_page_count(source) -> int:
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with open(source, 'rb') as fp:
+        document = PDFDocument(PDFParser(fp))
+        return int(resolve1(document.catalog['Pages'])['Count'])
+
+
+_pdf_pool_lock = Lock()
+_pdf_pool = None
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Get or create the shared process pool used for page-level PDF extraction."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # forkserver keeps the model, its threads and locks out of the worker processes
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=max(1, PDF_WORKERS),
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+        return _pdf_pool
+
+
+def iter_pdf_pages(content, page_timeout: float = PDF_PAGE_TIMEOUT) -> Iterator[str]:
+    """
+    Yield the text of each PDF page in order, as soon as it is available.
+
+    Pages are always extracted in the PDF process pool, where each one runs
+    under page_timeout. Documents with more than PDF_PARALLEL_MIN_PAGES pages
+    are split into page ranges across the workers; smaller ones, and documents
+    whose pages cannot be counted, go to one worker whole. Streams without a
+    file on disk are spooled under UPLOAD_FOLDER first, since workers read by path.
+
+    Args:
+        content: Seekable binary stream; its ``name`` is used as the path for workers
+        page_timeout (float): Seconds allowed per page
+
+    Yields:
+        str: Page text
+    """
+    path = getattr(content, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        yield from _iter_pooled_pdf_pages(path, page_timeout)
+        return
+
+    from uploads import UPLOAD_FOLDER
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_FOLDER, prefix='pdf-', suffix='.pdf') as spooled:
+        content.seek(0)
+        shutil.copyfileobj(content, spooled)
+        spooled.flush()
+        yield from _iter_pooled_pdf_pages(spooled.name, page_timeout)
+
+
+def _iter_pooled_pdf_pages(path: str, page_timeout: float) -> Iterator[str]:
+    try:
+        page_count = _pdf_page_count(path)
+    except Exception as e:
+        logging.warning(f"Unable to count PDF pages, extracting in one task: {str(e)}")
+        page_count = 0
+
+    if page_count >= PDF_PARALLEL_MIN_PAGES and PDF_WORKERS > 1:
+        ranges = [
+            (first_page, min(first_page + PDF_PAGES_PER_TASK, page_count))
+            for first_page in range(0, page_count, PDF_PAGES_PER_TASK)
+        ]
+    else:
+        ranges = [(0, page_count or float('inf'))]
+
+    submitted = [
+        _submit_extraction(
+            'pdf', _extract_pdf_page_range, path, first_page, last_page, page_timeout,
+            None if page_count else time.time() + EXTRACTION_FILE_TIMEOUT
+        )
+        for first_page, last_page in ranges
+    ]
+    try:
+        for (first_page, last_page), (future, pool) in zip(ranges, submitted):
+            # Workers enforce the limits themselves; this only guards against a hung worker
+            if page_count:
+                timeout = page_timeout * (last_page - first_page) + 30
+            else:
+                timeout = EXTRACTION_FILE_TIMEOUT + 30
+            try:
+                pages, scanned = _task_result(future, pool, 'pdf', timeout)
+            except FuturesTimeoutError:
+                logging.error(f"PDF pages {first_page + 1}-{last_page} timed out")
+                continue
+            except Exception as e:
+                logging.error(f"PDF pages {first_page + 1}-{last_page} extraction error: {str(e)}")
+                continue
+            yield from _with_scanned_pages(path, first_page, pages, scanned)
+    finally:
+        for future, _ in submitted:
+            future.cancel()
+
+_extraction_pool_lock = Lock()
+_extraction_pools: Dict[str, ProcessPoolExecutor] = {}
+
+def get_extraction_pool(group: str) -> ProcessPoolExecutor:
+    """Get or create the process pool for a format group; PDFs share the page-level PDF pool."""
+    if group == 'pdf':
+        return get_pdf_pool()
+    with _extraction_pool_lock:
+        if group not in _extraction_pools:
+            _extraction_pools[group] = ProcessPoolExecutor(
+                max_workers=max(1, EXTRACTION_GROUP_WORKERS[group]),
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+        return _extraction_pools[group]
+
+
+def _submit_extraction(group: str, *args) -> Tuple[Future, ProcessPoolExecutor]:
+    """Submit a task to a format group's pool; returns its future and the pool that runs it."""
+    pool = get_extraction_pool(group)
+    try:
+        return pool.submit(*args), pool
+    except BrokenProcessPool:
+        # A crashed worker (e.g. a parser killed for memory) breaks the whole pool; start a new one
+        logging.warning(f"Extraction pool for {group} files is broken, restarting it")
+        if _detach_pool(group, pool):
+            pool.shutdown(wait=False, cancel_futures=True)
+        pool = get_extraction_pool(group)
+        return pool.submit(*args), pool
+
+
+def _detach_pool(group: str, pool: ProcessPoolExecutor) -> bool:
+    """Stop handing out pool for group so the next submission starts a new one; False if already replaced."""
+    global _pdf_pool
+    if group == 'pdf':
+        with _pdf_pool_lock:
+            if _pdf_pool is not pool:
+                return False
+            _pdf_pool = None
+            return True
+    with _extraction_pool_lock:
+        if _extraction_pools.get(group) is not pool:
+            return False
+        del _extraction_pools[group]
+        return True
+
+
+def _recycle_pool(group: str, pool: ProcessPoolExecutor):
+    """
+    Replace a pool whose worker is stuck on a task its caller has abandoned.
+
+    A running task cannot be cancelled, so later requests get a fresh pool. The
+    old one finishes the tasks it already holds, which stay within their own
+    limits, and its workers are killed once that time has passed.
+    """
+    if not _detach_pool(group, pool):
+        return
+    logging.warning(f"Extraction pool for {group} files has a hung worker, replacing it")
+    pool.shutdown(wait=False)
+    reaper = threading.Timer(EXTRACTION_FILE_TIMEOUT + 30, _terminate_workers, args=(pool,))
+    reaper.daemon = True
+    reaper.start()
+
+
+def _task_result(future: Future, pool: ProcessPoolExecutor, group: str, timeout: float):
+    """
+    Wait for a pool task, allowing it timeout seconds once it is running.
+
+    A task still queued at the timeout is cancelled; one that started meanwhile
+    gets timeout seconds more, and if it is still running after those its worker
+    is hung and the pool is recycled.
+
+    Raises:
+        FuturesTimeoutError: If the task did not finish in time
+    """
+    try:
+        return future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        if future.cancel():
+            raise
+    try:
+        return future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        _recycle_pool(group, pool)
+        raise
+
+
+def _terminate_workers(pool: ProcessPoolExecutor):
+    # ProcessPoolExecutor has no public way to stop a running task
+    for process in list((pool._processes or {}).values()):
+        if process.is_alive():
+            process.terminate()
+
+
+def _extract_file(path: str, file_type: str, timeout: float) -> Tuple[List[str], List[int], bool]:
+    """
+    Extract one spooled file inside an extraction pool worker.
+
+    Returns:
+        Tuple[List[str], List[int], bool]: The text as segments, one per page for PDFs, the
+            scanned PDF pages still to recognize in the OCR pool, and whether the size budget
+            already cut the text; PDF pages are only bounded once their scans are recognized
+    """
+    try:
+        with open(path, 'rb') as content:
+            if file_type == 'pdf':
+                # PDFs are bounded page by page and stop at the file deadline; other formats are interrupted by it
+                pages, scanned = _extract_pdf_page_range(content, 0, float('inf'), PDF_PAGE_TIMEOUT, time.time() + timeout)
+                return pages, scanned, False
+            with _page_deadline(timeout):
+                segments = iter_document_segments(content, file_type)
+                return ["".join(segments)], [], segments.truncated
+    except _PageTimeout:
+        logging.warning(f"Extraction of {file_type} file exceeded {timeout}s, skipping")
+        return [], [], False
+
+
+class _ExtractionTask:
+    """A file, or one scanned page of it, being extracted in a pool."""
+
+    __slots__ = ('key', 'path', 'file_type', 'group', 'pool', 'limit', 'deadline', 'page_number')
+
+    def __init__(self, key: Hashable, path: str, file_type: str, group: str, pool: ProcessPoolExecutor,
+                 limit: float, deadline: float, page_number: Optional[int] = None):
+        self.key = key
+        self.path = path
+        self.file_type = file_type
+        self.group = group
+        self.pool = pool
+        # Seconds the task may run once started, enforced by the worker itself
+        self.limit = limit
+        self.deadline = deadline
+        self.page_number = page_number
+
+
+def extract_documents(items: Iterable[Tuple[Hashable, str, str]],
+                      timeout: float = EXTRACTION_FILE_TIMEOUT) -> Iterator[Tuple[Hashable, str, bool]]:
+    """
+    Start extracting several files in the format pools at once and iterate over their texts as they finish.
+
+    Scanned pages a PDF worker finds are recognized in the OCR pool before the
+    PDF is returned, so tesseract never occupies the PDF workers.
+
+    Args:
+        items (Iterable): (key, path, file_type) for every file spooled to disk
+        timeout (float): Seconds one file may take once a worker has started it
+
+    Returns:
+        Iterator[Tuple[Hashable, str, bool]]: Each item's key, its text, empty if extraction failed
+            or timed out, and whether the size budget cut the text, in completion order
+    """
+    tasks: Dict[Future, _ExtractionTask] = {}
+    queued: Dict[str, int] = {}
+    for key, path, file_type in items:
+        file_type = file_type.lower()
+        group = EXTRACTION_FORMAT_GROUPS.get(file_type, 'office')
+        # Files ahead of this one in its group push its deadline back by whole rounds of the pool
+        rounds = queued.get(group, 0) // max(1, EXTRACTION_GROUP_WORKERS[group]) + 1
+        queued[group] = queued.get(group, 0) + 1
+        future, pool = _submit_extraction(group, _extract_file, path, file_type, timeout)
+        tasks[future] = _ExtractionTask(key, path, file_type, group, pool, timeout, time.time() + (timeout + 30) * rounds)
+
+    return _iter_extracted(tasks)
+
+
+def _iter_extracted(tasks: Dict[Future, _ExtractionTask]) -> Iterator[Tuple[Hashable, str, bool]]:
+    submitted_at = time.time()
+    pending = set(tasks)
+    # Pages of PDFs waiting for their scanned pages, and how many of those are still out
+    waiting: Dict[Hashable, list] = {}
+    # Tasks found running at their deadline, which get one more limit before their worker counts as hung
+    extended = set()
+
+    def finish(task: _ExtractionTask, result) -> Optional[Tuple[str, bool]]:
+        """Record a finished task; returns the file's text and truncation once nothing of it is left to do."""
+        truncated = False
+        if task.page_number is None:
+            pages, scanned, truncated = result or ([], [], False)
+            if scanned:
+                waiting[task.key] = [list(pages), len(scanned)]
+                for index, page_number in enumerate(scanned):
+                    future, pool = _submit_extraction('ocr', _ocr_scanned_page, task.path, page_number, PDF_PAGE_TIMEOUT)
+                    rounds = index // max(1, EXTRACTION_GROUP_WORKERS['ocr']) + 1
+                    tasks[future] = _ExtractionTask(
+                        task.key, task.path, task.file_type, 'ocr', pool, PDF_PAGE_TIMEOUT,
+                        time.time() + (PDF_PAGE_TIMEOUT + 30) * rounds, page_number
+                    )
+                    pending.add(future)
+                return None
+        else:
+            pages = waiting[task.key][0]
+            if result:
+                pages[task.page_number] = result
+            waiting[task.key][1] -= 1
+            if waiting[task.key][1] > 0:
+                return None
+            del waiting[task.key]
+        EXTRACTION_SECONDS.observe(time.time() - submitted_at, file_type=file_type_label(task.file_type))
+        segments = BoundedSegments(iter(pages), task.file_type)
+        return "".join(segments), truncated or segments.truncated
+
+    try:
+        while pending:
+            # Workers enforce the limits themselves; the deadline only guards against a hung worker
+            next_deadline = min(tasks[future].deadline for future in pending)
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - time.time()), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                task = tasks.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Error extracting text from {task.file_type} file: {str(e)}")
+                    result = None
+                extracted = finish(task, result)
+                if extracted is not None:
+                    text, truncated = extracted
+                    yield task.key, text, truncated
+
+            for future in [future for future in pending if tasks[future].deadline <= time.time()]:
+                task = tasks[future]
+                if future not in extended and not future.cancel():
+                    # Started late behind other files; deadlines are only estimates of its queue time
+                    extended.add(future)
+                    task.deadline = time.time() + task.limit + 30
+                    continue
+                pending.discard(future)
+                del tasks[future]
+                logging.error(f"Extraction of {task.file_type} file timed out")
+                if future in extended:
+                    # Still running past every limit of its own: the worker is hung
+                    _recycle_pool(task.group, task.pool)
+                extracted = finish(task, None)
+                if extracted is not None:
+                    text, truncated = extracted
+                    yield task.key, text, truncated
+    finally:
+        for future in pending:
+            future.cancel()
+
+def _iter_docx_paragraphs(content) -> Iterator[str]:
+    from docx import Document
+    for para in Document(content).paragraphs:
+        if para.text:
+            yield para.text + "\n"
+
+def _iter_excel_rows(content) -> Iterator[str]:
+    from openpyxl import load_workbook
+    wb = load_workbook(content, read_only=True)
+    try:
+        for sheet in wb:
+            for row in sheet.iter_rows(values_only=True):
+                row_text = " | ".join([str(cell) for cell in row if cell])
+                if row_text:
+                    yield row_text + "\n"
+    finally:
+        wb.close()
+
+def _iter_pptx_slides(content) -> Iterator[str]:
+    from pptx import Presentation
+    for slide in Presentation(content).slides:
+        slide_text = "".join(
+            shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text") and shape.text
+        )
+        if slide_text:
+            yield slide_text
+
+def _iter_image_text(content) -> Iterator[str]:
+    from ocr import ocr_image
+    yield ocr_image(content)
+
+
+_SEGMENT_EXTRACTORS: Dict[str, Callable[[BinaryIO], Iterator[str]]] = {}
+register_extractor(['pdf'], _iter_pdf_text)
+register_extractor(['docx', 'doc'], _iter_docx_paragraphs)
+register_extractor(['xlsx', 'xls'], _iter_excel_rows)
+register_extractor(['pptx', 'ppt'], _iter_pptx_slides)
+register_extractor(['txt', 'md'], _iter_plain_text)
+register_extractor(['png', 'jpg', 'jpeg', 'tif', 'tiff'], _iter_image_text)
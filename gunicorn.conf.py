@@ -0,0 +1,49 @@
+import os
+import gc
+import sys
+import subprocess
+
+# MODEL_PRELOAD=1 loads the model once in the master; forked workers share its
+# weights copy-on-write, so the worker count can follow the cores instead of RAM
+preload_app = os.getenv('MODEL_PRELOAD', '0') == '1'
+# MODEL_SERVER_SOCKET moves the model into one model_server.py process; workers only tokenize
+model_server_socket = os.getenv('MODEL_SERVER_SOCKET', '')
+_shares_weights = preload_app or bool(model_server_socket) or os.getenv('MODEL_WEIGHTS_MMAP', '0') == '1'
+
+workers = int(os.getenv('GUNICORN_WORKERS', str(os.cpu_count() or 1) if _shares_weights else '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# Workers read this to split the cores between their torch thread pools
+os.environ['GUNICORN_WORKERS'] = str(workers)
+
+_model_server = None
+
+
+def on_starting(server):
+    global _model_server
+    if model_server_socket and os.getenv('MODEL_SERVER_AUTOSTART', '1') == '1':
+        _model_server = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_server.py'),
+             '--socket', model_server_socket]
+        )
+        server.log.info(f"Started model server (pid {_model_server.pid}) on {model_server_socket}")
+
+
+def on_exit(server):
+    if _model_server is not None:
+        _model_server.terminate()
+        _model_server.wait(timeout=30)
+
+
+def pre_fork(server, worker):
+    # Move every object the master created into the permanent generation so the
+    # children's collector never writes to (and un-shares) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import metrics
+    metrics.start_flusher()
+    if preload_app:
+        import model
+        model.after_fork()
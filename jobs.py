@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Callable, Dict, Optional
+from concurrency import QueueFullError
+from uploads import UPLOAD_FOLDER
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '32'))
+# Jobs are not bound by the gunicorn request timeout
+JOB_TIME_BUDGET = float(os.getenv('JOB_TIME_BUDGET', '900'))
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))
+JOB_RETRY_AFTER = int(os.getenv('JOB_RETRY_AFTER', '30'))
+# Job state is written here so any gunicorn worker can answer status polls
+JOB_DIR = os.getenv('JOB_DIR', os.path.join(UPLOAD_FOLDER, 'jobs'))
+
+_JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class Job:
+    """State and progress of one summarization job."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.state = 'queued'
+        self.chunks_done = 0
+        self.chunks_total = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.updated_at = self.created_at
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'state': self.state,
+            'progress': {
+                'chunks_done': self.chunks_done,
+                'chunks_total': self.chunks_total
+            },
+            'error': self.error,
+            'result': self.result,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class JobManager:
+    """Runs summarization jobs on a bounded worker pool and shares their state through JOB_DIR."""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE, job_dir: str = JOB_DIR):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summary-job')
+        self.slots = BoundedSemaphore(max_workers + max_queued)
+        self.job_dir = job_dir
+        self.jobs: Dict[str, Job] = {}
+        self.lock = Lock()
+        self.last_saved: Dict[str, float] = {}
+        self.last_pruned = 0.0
+        os.makedirs(self.job_dir, exist_ok=True)
+
+    def submit(self, work: Callable[[Callable[[int, int], None]], Dict]) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            work (Callable): Receives a progress callback and returns the job result
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            QueueFullError: If all worker and queue slots are taken
+        """
+        if not self.slots.acquire(blocking=False):
+            raise QueueFullError("Job queue is full")
+
+        job = Job(uuid.uuid4().hex)
+        with self.lock:
+            self.jobs[job.job_id] = job
+        self._save(job)
+        self.executor.submit(self._run, job, work)
+        self._prune_expired()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job state, looking in the shared job directory for jobs owned by other workers."""
+        if not _JOB_ID_PATTERN.fullmatch(job_id or ''):
+            return None
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Error reading job {job_id}: {str(e)}")
+            return None
+
+    def _run(self, job: Job, work: Callable):
+        try:
+            self._update(job, state='running')
+            result = work(lambda done, added: self._report_progress(job, done, added))
+            self._update(job, state='completed', result=result)
+        except Exception as e:
+            logging.error(f"Summary job {job.job_id} failed: {str(e)}")
+            logging.error(traceback.format_exc())
+            self._update(job, state='failed', error=str(e))
+        finally:
+            with self.lock:
+                self.jobs.pop(job.job_id, None)
+                self.last_saved.pop(job.job_id, None)
+            self.slots.release()
+
+    def _report_progress(self, job: Job, done: int, added: int):
+        with self.lock:
+            job.chunks_done += done
+            job.chunks_total += added
+            # Progress can tick per chunk; only persist it a couple of times per second
+            now = time.time()
+            if now - self.last_saved.get(job.job_id, 0.0) < 0.5:
+                return
+            self.last_saved[job.job_id] = now
+        self._save(job)
+
+    def _update(self, job: Job, **changes):
+        with self.lock:
+            for key, value in changes.items():
+                setattr(job, key, value)
+            job.updated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._save(job)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _save(self, job: Job):
+        try:
+            with self.lock:
+                state = job.to_dict()
+            fd, tmp_path = tempfile.mkstemp(dir=self.job_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._path(job.job_id))
+        except Exception as e:
+            logging.error(f"Error saving job {job.job_id}: {str(e)}")
+
+    def _prune_expired(self):
+        """Remove finished job files older than JOB_RESULT_TTL, at most once a minute."""
+        now = time.time()
+        if now - self.last_pruned < 60:
+            return
+        self.last_pruned = now
+        try:
+            for entry in os.scandir(self.job_dir):
+                if entry.name.endswith('.json') and now - entry.stat().st_mtime > JOB_RESULT_TTL:
+                    with self.lock:
+                        if entry.name[:-len('.json')] in self.jobs:
+                            continue
+                    os.unlink(entry.path)
+        except Exception as e:
+            logging.warning(f"Error pruning expired jobs: {str(e)}")
+
+
+# Singleton instance creation
+_job_manager_lock = Lock()
+_job_manager = None
+
+def get_job_manager() -> JobManager:
+    """Get or create the process-wide job manager."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+        return _job_manager
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+import psutil
+
+# Every process (gunicorn worker) snapshots its metrics here; /metrics sums all snapshots
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/sycx_metrics')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# Counters and histograms of exited processes are folded into this file, so a reused
+# pid never overwrites a dead worker's totals
+EXITED_SNAPSHOT = 'metrics-exited.json'
+# Snapshot entry identifying the process that wrote it
+_PROCESS_KEY = '__process__'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], object] = {}
+        self.lock = Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> List:
+        with self.lock:
+            return [[list(key), value] for key, value in self.values.items()]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Per-process value; exported with a pid label instead of being summed."""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0, 0))
+            counts = list(counts)
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> List:
+        with self.lock:
+            return [[list(key), [list(counts), total, count]] for key, (counts, total, count) in self.values.items()]
+
+
+_registry: List[_Metric] = []
+
+EXTRACTION_SECONDS = Histogram(
+    'sycx_extraction_seconds', 'Document text extraction time', ['file_type'])
+CHUNKS_PER_DOCUMENT = Histogram(
+    'sycx_chunks_per_document', 'Chunks produced by the first map-reduce level', buckets=COUNT_BUCKETS)
+INPUT_TOKENS = Counter('sycx_input_tokens_total', 'Tokens fed to the summarizer')
+OUTPUT_TOKENS = Counter('sycx_output_tokens_total', 'Tokens generated by the summarizer')
+GENERATION_SECONDS = Histogram(
+    'sycx_generation_seconds', 'Per-text summarization latency including queueing', ['depth'])
+BATCH_SECONDS = Histogram('sycx_batch_generation_seconds', 'Latency of one batched summarizer call')
+BATCH_SIZE = Histogram('sycx_batch_size', 'Texts per batched summarizer call', buckets=COUNT_BUCKETS)
+QUEUE_WAIT_SECONDS = Histogram('sycx_inference_queue_wait_seconds', 'Time texts wait for a batch slot')
+CACHE_LOOKUPS = Counter('sycx_cache_lookups_total', 'Summary cache lookups', ['cache', 'result'])
+DEDUP_REMOVED_TOKENS = Counter(
+    'sycx_dedup_removed_tokens_total', 'Tokens removed as repeated lines or near-duplicate chunks', ['stage'])
+MODEL_MEMORY_BYTES = Gauge('sycx_model_memory_bytes', 'Size of the loaded model weights')
+PROCESS_RSS_BYTES = Gauge('sycx_process_resident_memory_bytes', 'Resident memory of the worker process')
+PROCESS_USS_BYTES = Gauge(
+    'sycx_process_unique_memory_bytes', 'Memory private to the worker, excluding pages shared with other workers')
+PROCESS_PSS_BYTES = Gauge(
+    'sycx_process_proportional_memory_bytes', 'Worker memory with shared pages split across the processes using them')
+
+
+def _process_start_time(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except psutil.Error:
+        return None
+
+
+def _snapshot() -> Dict:
+    process = psutil.Process(os.getpid())
+    try:
+        # Shared model pages count fully in RSS; USS/PSS show what each worker really adds
+        memory = process.memory_full_info()
+        PROCESS_USS_BYTES.set(memory.uss)
+        if hasattr(memory, 'pss'):
+            PROCESS_PSS_BYTES.set(memory.pss)
+    except (psutil.AccessDenied, AttributeError):
+        memory = process.memory_info()
+    PROCESS_RSS_BYTES.set(memory.rss)
+    snapshot = {
+        metric.name: {
+            'kind': metric.kind,
+            'documentation': metric.documentation,
+            'labelnames': list(metric.labelnames),
+            'buckets': list(getattr(metric, 'buckets', ())),
+            'samples': metric.samples()
+        }
+        for metric in _registry
+    }
+    snapshot[_PROCESS_KEY] = {'pid': os.getpid(), 'create_time': _process_start_time(os.getpid())}
+    return snapshot
+
+
+def _write_json(path: str, data: Dict):
+    fd, tmp_path = tempfile.mkstemp(dir=METRICS_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+_folded_pid = None
+
+def flush():
+    """Write this process's metrics snapshot to METRICS_DIR."""
+    global _folded_pid
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        if _folded_pid != os.getpid():
+            _folded_pid = os.getpid()
+            # A dead process with this pid may have left a snapshot; keep its totals before overwriting it
+            try:
+                fold_exited_snapshots()
+            except Exception as e:
+                logging.warning(f"Error folding exited metrics snapshots: {str(e)}")
+        _write_json(os.path.join(METRICS_DIR, f"metrics-{os.getpid()}.json"), _snapshot())
+    except Exception as e:
+        logging.warning(f"Error writing metrics snapshot: {str(e)}")
+
+
+def _merge_snapshot(merged: Dict[str, Dict], snapshot: Dict, pid: str, alive: bool):
+    """Add a snapshot's samples to merged: counters and histograms summed, gauges kept per live pid."""
+    for name, metric in snapshot.items():
+        if name == _PROCESS_KEY:
+            continue
+        target = merged.setdefault(name, dict(metric, values={}))
+        for labels, value in metric['samples']:
+            if metric['kind'] == 'gauge':
+                if alive:
+                    target['values'][tuple(labels) + (pid,)] = value
+            elif metric['kind'] == 'counter':
+                target['values'][tuple(labels)] = target['values'].get(tuple(labels), 0.0) + value
+            else:
+                counts, total, count = target['values'].get(tuple(labels), ([0] * len(value[0]), 0.0, 0))
+                target['values'][tuple(labels)] = (
+                    [a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]
+                )
+
+
+def _is_running(pid: int, snapshot: Dict) -> bool:
+    """Whether the process that wrote snapshot still runs, and not merely another one with its pid."""
+    create_time = snapshot.get(_PROCESS_KEY, {}).get('create_time')
+    if create_time is None:
+        return psutil.pid_exists(pid)
+    return _process_start_time(pid) == create_time
+
+
+def fold_exited_snapshots():
+    """Move the counters and histograms of exited processes into EXITED_SNAPSHOT and delete their files."""
+    with open(os.path.join(METRICS_DIR, '.lock'), 'w') as lock_file:
+        # Workers rendering at the same time must not fold one snapshot twice
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        exited = []
+        for entry in os.scandir(METRICS_DIR):
+            pid = entry.name[len('metrics-'):-len('.json')]
+            if not (entry.name.startswith('metrics-') and entry.name.endswith('.json') and pid.isdigit()):
+                continue
+            try:
+                with open(entry.path) as f:
+                    snapshot = json.load(f)
+            except Exception:
+                continue
+            if not _is_running(int(pid), snapshot):
+                exited.append((entry.path, pid, snapshot))
+        if not exited:
+            return
+
+        exited_path = os.path.join(METRICS_DIR, EXITED_SNAPSHOT)
+        merged: Dict[str, Dict] = {}
+        try:
+            with open(exited_path) as f:
+                _merge_snapshot(merged, json.load(f), 'exited', False)
+        except FileNotFoundError:
+            pass
+        for _, pid, snapshot in exited:
+            _merge_snapshot(merged, snapshot, pid, False)
+        _write_json(exited_path, {
+            name: {
+                **{key: value for key, value in metric.items() if key != 'values'},
+                'samples': [[list(labels), value] for labels, value in metric['values'].items()]
+            }
+            for name, metric in merged.items() if metric['kind'] != 'gauge'
+        })
+        for path, _, _ in exited:
+            os.remove(path)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+_flusher_lock = Lock()
+_flusher_pid = None
+
+def start_flusher():
+    """Start the background snapshot thread once per process (again after a fork)."""
+    global _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_periodically, name='metrics-flush', daemon=True).start()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """
+    Render metrics from every worker in the Prometheus text exposition format.
+
+    Counters and histograms are summed across processes, including exited ones,
+    whose totals live on in EXITED_SNAPSHOT so they stay monotonic; gauges are
+    reported per live process with a pid label.
+    """
+    flush()
+    try:
+        fold_exited_snapshots()
+    except Exception as e:
+        logging.warning(f"Error folding exited metrics snapshots: {str(e)}")
+    merged: Dict[str, Dict] = {}
+    try:
+        snapshot_files = [entry for entry in os.scandir(METRICS_DIR) if entry.name.endswith('.json')]
+    except FileNotFoundError:
+        snapshot_files = []
+
+    for entry in snapshot_files:
+        pid = entry.name[len('metrics-'):-len('.json')]
+        try:
+            with open(entry.path) as f:
+                snapshot = json.load(f)
+        except Exception:
+            continue
+        _merge_snapshot(merged, snapshot, pid, pid.isdigit() and psutil.pid_exists(int(pid)))
+
+    lines = []
+    for name, metric in merged.items():
+        labelnames = metric['labelnames']
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric['values'].items()):
+            if metric['kind'] == 'gauge':
+                lines.append(f"{name}{_format_labels(labelnames + ['pid'], labels)} {_format_value(value)}")
+            elif metric['kind'] == 'counter':
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+            else:
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(metric['buckets'] + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labelnames + ['le'], list(labels) + [le])} {cumulative}"
+                    )
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {count}")
+
+    # Hit ratio per cache, derived from the aggregated lookup counters
+    lookups = merged.get(CACHE_LOOKUPS.name, {}).get('values', {})
+    caches = sorted({labels[0] for labels in lookups})
+    if caches:
+        lines.append("# HELP sycx_cache_hit_ratio Fraction of summary cache lookups that hit")
+        lines.append("# TYPE sycx_cache_hit_ratio gauge")
+        for cache in caches:
+            hits = lookups.get((cache, 'hit'), 0.0)
+            total = hits + lookups.get((cache, 'miss'), 0.0)
+            lines.append(f'sycx_cache_hit_ratio{{cache="{cache}"}} {_format_value(hits / total if total else 0.0)}')
+
+    return '\n'.join(lines) + '\n'
@@ -1,9 +1,10 @@
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM, AutoModel
+from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM, AutoModel, AutoConfig, GenerationConfig
 import torch
 import nltk
 import logging
 from logging.handlers import RotatingFileHandler
-from typing import Optional, List, Dict, Union
+from typing import Callable, Iterable, Iterator, Optional, List, Dict, Tuple, Union
+from collections import OrderedDict
 import os
 import base64
 import io
@@ -11,16 +12,76 @@ from dotenv import load_dotenv
 import time
 import traceback
 import re
-import psutil
 import gc
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+import copy
+import uuid
+from bisect import bisect_left, bisect_right
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeoutError
+from threading import Lock, Thread
 from contextlib import contextmanager
+from functools import partial
+from scheduler import InferenceScheduler, INFERENCE_BATCH_SIZE
+from cache import get_chunk_cache
+from backends import build_summarizer, configure_torch_threads, INFERENCE_BACKEND
+from metrics import CHUNKS_PER_DOCUMENT, DEDUP_REMOVED_TOKENS, GENERATION_SECONDS, MODEL_MEMORY_BYTES
+from extractive import select_sentences, split_sentences
+from dedup import collapse_near_duplicates, drop_repeated_lines
+from nltk_setup import use_local_nltk_data
+from concurrency import MemoryManager, adjust_memory_baseline, mark_memory_baseline
+from model_server import ModelServerClient, MODEL_SERVER_SOCKET
 
 # Load environment variables
 load_dotenv()
 HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY')
-MAX_MEMORY_MB = int(os.getenv('MAX_MEMORY_MB', str(int(1.2 * 1024))))
+# Keep long documents inside the gunicorn worker timeout (120s)
+SUMMARY_TIME_BUDGET = float(os.getenv('SUMMARY_TIME_BUDGET', '100'))
+MAX_REDUCE_LEVELS = int(os.getenv('MAX_REDUCE_LEVELS', '5'))
+# Share of a model window the chunk summaries of a reduce level may fill, leaving room for retokenization
+REDUCE_WINDOW_FILL = 0.9
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '0'))
+# Characters tokenized at once while chunking; bounds the offset mapping held for long documents
+CHUNK_SLICE_CHARS = int(os.getenv('CHUNK_SLICE_CHARS', '262144'))
+# Opt-in: rank sentences and keep only the top ones before abstractive generation. It caps
+# the text the map-reduce levels see, trading coverage of long documents for speed
+EXTRACTIVE_PREFILTER = os.getenv('EXTRACTIVE_PREFILTER', '0') == '1'
+# Drop repeated headers/footers/rows and near-duplicate chunks before generation
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', '1') == '1'
+# Model windows of text kept per unit of (1 + summary_depth)
+EXTRACTIVE_BUDGET_WINDOWS = float(os.getenv('EXTRACTIVE_BUDGET_WINDOWS', '2'))
+# Load CPU weights from a memory-mapped checkpoint so every worker shares one page-cache copy
+MODEL_WEIGHTS_MMAP = os.getenv('MODEL_WEIGHTS_MMAP', '0') == '1'
+MODEL_MMAP_DIR = os.getenv('MODEL_MMAP_DIR', 'mmap_models')
+DEFAULT_MODEL_NAME = "facebook/bart-large-cnn"
+# Comma-separated min_depth:model routes, e.g. "0:sshleifer/distilbart-cnn-12-6,2:facebook/bart-large-cnn";
+# each request uses the model of the highest route its summary depth reaches
+SUMMARY_MODELS = os.getenv('SUMMARY_MODELS', f'0:{DEFAULT_MODEL_NAME}')
+# Loaded weights above this budget evict the least recently used idle model; 0, the default,
+# keeps every configured route loaded, which is what routing between models needs
+MODEL_CACHE_BUDGET_MB = float(os.getenv('MODEL_CACHE_BUDGET_MB', '0'))
+MODEL_IDLE_TIMEOUT = float(os.getenv('MODEL_IDLE_TIMEOUT', '300'))
+
+
+def _parse_model_routes(spec: str) -> List[tuple]:
+    """Parse SUMMARY_MODELS into sorted (min_depth, model_name) pairs."""
+    routes = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        min_depth, _, model_name = item.strip().partition(':')
+        try:
+            routes.append((float(min_depth), model_name.strip()))
+        except ValueError:
+            raise ValueError(f"Invalid SUMMARY_MODELS entry '{item}', expected min_depth:model")
+    return sorted(routes) or [(0.0, DEFAULT_MODEL_NAME)]
+
+
+SUMMARY_MODEL_ROUTES = _parse_model_routes(SUMMARY_MODELS)
+
+_WARMUP_TEXT = (
+    "Artificial intelligence is a field of computer science that builds machines able to perform tasks "
+    "that usually require human intelligence, such as learning, perception and language understanding. "
+    "Machine learning, a subset of the field, develops algorithms that learn from data."
+)
 
 # Create logs directory if it doesn't exist
 os.makedirs('logs', exist_ok=True)
@@ -39,165 +100,373 @@ logging.basicConfig(
     ]
 )
 
-class MemoryManager:
-    """Manages memory usage and cleanup for the application."""
-    
-    def __init__(self, threshold_percent: float = 90.0):
-        self.threshold_percent = threshold_percent
-        self.memory_threshold = (MAX_MEMORY_MB * 1024 * 1024 * threshold_percent) / 100.0
-        
-    def get_memory_usage(self) -> float:
-        """Get current memory usage in bytes."""
-        process = psutil.Process(os.getpid())
-        return process.memory_info().rss
-    
-    def check_memory(self) -> bool:
-        """Check if memory usage is below threshold."""
-        return self.get_memory_usage() < self.memory_threshold
+class _CachedModel:
+    """A loaded model with its in-flight use count."""
+
+    __slots__ = ('model', 'refcount', 'last_used', 'size')
+
+    def __init__(self, model: 'SummarizationModel', size: int):
+        self.model = model
+        self.refcount = 0
+        self.last_used = time.time()
+        self.size = size
+
+
+class ModelCache:
+    """
+    Registry of loaded summarization models, picked per request by summary depth.
     
+    Models load lazily on first use. Every use is refcounted, and only models with
+    no generation in flight are evicted: least recently used first once their
+    weights exceed memory_budget, and any model idle for longer than idle_timeout.
+    The most recently used model always stays loaded.
+    """
+
+    def __init__(self, routes: Optional[List[tuple]] = None, memory_budget: float = MODEL_CACHE_BUDGET_MB * 1024 * 1024,
+                 idle_timeout: float = MODEL_IDLE_TIMEOUT, server_address: Optional[str] = None):
+        self.routes = sorted(routes or SUMMARY_MODEL_ROUTES)
+        self.memory_budget = memory_budget or float('inf')
+        self.idle_timeout = idle_timeout
+        self.server_address = server_address
+        if server_address and len(self.model_names()) > 1:
+            logging.warning(f"Model server mode serves only {DEFAULT_MODEL_NAME}; SUMMARY_MODELS routes are ignored")
+        self._reset()
+
+    def _reset(self):
+        self.entries: 'OrderedDict[str, _CachedModel]' = OrderedDict()
+        self.load_locks: Dict[str, Lock] = {}
+        self.lock = Lock()
+        self.janitor_pid = None
+
+    def model_names(self) -> List[str]:
+        """Configured model names, cheapest (shallowest route) first."""
+        return list(dict.fromkeys(name for _, name in self.routes))
+
+    def model_name_for(self, summary_depth: float) -> str:
+        """The cheapest model routed to summary_depth: the last route whose minimum depth it reaches."""
+        if self.server_address:
+            return DEFAULT_MODEL_NAME
+        name = self.routes[0][1]
+        for min_depth, route_name in self.routes:
+            if summary_depth >= min_depth:
+                name = route_name
+        return name
+
+    def acquire(self, model_name: str) -> 'SummarizationModel':
+        """Get a model, loading it if needed, and count one use of it until release()."""
+        self._start_janitor()
+        with self.lock:
+            load_lock = self.load_locks.setdefault(model_name, Lock())
+        # Loads of one model are serialized; other models stay usable meanwhile
+        with load_lock:
+            with self.lock:
+                entry = self.entries.get(model_name)
+                if entry is not None:
+                    entry.refcount += 1
+                    entry.last_used = time.time()
+                    self.entries.move_to_end(model_name)
+                    return entry.model
+
+            model = SummarizationModel(model_name, server_address=self.server_address)
+            entry = _CachedModel(model, model.resident_bytes)
+            entry.refcount = 1
+            with self.lock:
+                self.entries[model_name] = entry
+                evicted = self._over_budget()
+        self._unload(evicted)
+        return model
+
+    def release(self, model_name: str):
+        with self.lock:
+            entry = self.entries.get(model_name)
+            if entry is not None:
+                entry.refcount -= 1
+                entry.last_used = time.time()
+                self.entries.move_to_end(model_name)
+            # Models held past the budget while a load ran can go once they are idle
+            evicted = self._over_budget()
+        self._unload(evicted)
+
     @contextmanager
-    def monitor_memory(self, operation_name: str):
-        """Context manager to monitor memory usage during operations."""
-        start_mem = self.get_memory_usage()
+    def use(self, model_name: str):
+        """Hold a model for the duration of the block so it cannot be evicted mid-generation."""
+        model = self.acquire(model_name)
         try:
-            yield
+            yield model
         finally:
-            end_mem = self.get_memory_usage()
-            diff_mem = end_mem - start_mem
-            logging.info(
-                f"Memory usage for {operation_name}: "
-                f"Start: {start_mem / 1024 / 1024:.2f}MB, "
-                f"End: {end_mem / 1024 / 1024:.2f}MB, "
-                f"Diff: {diff_mem / 1024 / 1024:.2f}MB"
+            self.release(model_name)
+
+    def check_budget(self, route_bytes: int):
+        """Warn when the configured routes' weights, route_bytes in total, cannot stay loaded together."""
+        if route_bytes > self.memory_budget:
+            logging.warning(
+                f"SUMMARY_MODELS weights total {route_bytes / 1024 / 1024:.0f}MB but MODEL_CACHE_BUDGET_MB is "
+                f"{self.memory_budget / 1024 / 1024:.0f}MB; requests alternating between routes will reload "
+                f"models from disk"
             )
-    
-    def cleanup(self):
-        """Perform memory cleanup operations."""
+
+    def _evictable(self) -> List[str]:
+        """Idle models in least recently used order, never the most recently used one."""
+        return [name for name, entry in list(self.entries.items())[:-1] if entry.refcount == 0]
+
+    def _over_budget(self) -> List[tuple]:
+        """Remove least recently used idle models until the rest fit memory_budget; returns them."""
+        total = sum(entry.size for entry in self.entries.values())
+        evicted = []
+        for name in self._evictable():
+            if total <= self.memory_budget:
+                break
+            entry = self.entries.pop(name)
+            total -= entry.size
+            evicted.append((name, entry))
+        return evicted
+
+    def cleanup_if_stale(self):
+        """Unload models nobody has used for idle_timeout seconds."""
+        cutoff = time.time() - self.idle_timeout
+        with self.lock:
+            evicted = [
+                (name, self.entries.pop(name)) for name in self._evictable()
+                if self.entries[name].last_used < cutoff
+            ]
+        self._unload(evicted)
+
+    def _unload(self, evicted: List[tuple]):
+        if not evicted:
+            return
+        for name, entry in evicted:
+            logging.info(f"Unloading idle model {name} ({entry.size / 1024 / 1024:.0f}MB)")
+            entry.model.scheduler.shutdown()
+            adjust_memory_baseline(-entry.model.resident_bytes)
+        # Drop the last references to the weights before collecting
+        del entry
+        evicted.clear()
         gc.collect()
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
-class ModelCache:
-    """Manages model caching and cleanup."""
-    
-    def __init__(self):
-        self.model = None
-        self.tokenizer = None
-        self.last_used = 0
-        self.lock = Lock()
-        self.cache_timeout = 300  # 5 minutes
-        
-    def cleanup_if_stale(self):
-        """Clean up model if it hasn't been used recently."""
-        if (time.time() - self.last_used) > self.cache_timeout:
-            with self.lock:
-                if self.model is not None:
-                    del self.model
-                    del self.tokenizer
-                    self.model = None
-                    self.tokenizer = None
-                    gc.collect()
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
+    def _start_janitor(self):
+        with self.lock:
+            if self.janitor_pid == os.getpid():
+                return
+            self.janitor_pid = os.getpid()
+        Thread(target=self._janitor, name='model-cache-janitor', daemon=True).start()
+
+    def _janitor(self):
+        while True:
+            time.sleep(max(self.idle_timeout / 4, 1.0))
+            try:
+                self.cleanup_if_stale()
+            except Exception as e:
+                logging.error(f"Error evicting idle models: {str(e)}")
+
+    def after_fork(self):
+        """Keep the forked models but give them fresh locks and scheduler threads."""
+        entries = self.entries
+        self._reset()
+        self.entries = entries
+        for entry in entries.values():
+            entry.refcount = 0
+            entry.model.scheduler.restart_after_fork()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                name: {'in_use': entry.refcount, 'memory_mb': round(entry.size / 1024 / 1024, 1)}
+                for name, entry in self.entries.items()
+            }
 
 class SummarizationModel:
-    def __init__(self, model_name: str = "facebook/bart-large-cnn"):
-        """Initialize the summarization model with optimized parameters."""
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, server_address: Optional[str] = None):
+        """
+        Initialize the summarization model with optimized parameters.
+        
+        Args:
+            model_name (str): Hugging Face model id or path
+            server_address (str): Unix socket of a model server; if given only the tokenizer
+                is loaded here and generation runs in the server process
+        """
         try:
             self.model_name = model_name
             self.memory_manager = MemoryManager()
-            self.model_cache = ModelCache()
+            # Weights loaded below are baseline memory, not request work
+            mark_memory_baseline()
+            self._rss_at_init = self.memory_manager.get_memory_usage()
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
             # Add error handling for model loading
             try:
                 self.tokenizer = AutoTokenizer.from_pretrained(model_name, token=HUGGINGFACE_API_KEY)
-                self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name, token=HUGGINGFACE_API_KEY)
-                self.model.to(self.device)
+                # Fast tokenizers fail with "Already borrowed" when two threads change their
+                # truncation settings at once; request threads share this one under a lock
+                self.tokenizer_lock = Lock()
+                if server_address:
+                    self.model = None
+                elif MODEL_WEIGHTS_MMAP and self.device.type == 'cpu':
+                    self.model = self._load_mmap_model(model_name)
+                else:
+                    self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name, token=HUGGINGFACE_API_KEY)
+                if self.model is not None:
+                    self.model.to(self.device)
             except Exception as e:
                 logging.error(f"Error loading model: {str(e)}")
                 raise RuntimeError(f"Failed to load model {model_name}: {str(e)}")
 
+            if not server_address:
+                configure_torch_threads()
+
             # Add try-except for pipeline creation
             try:
-                self.summarizer = pipeline(
-                    "summarization",
-                    model=self.model,
-                    tokenizer=self.tokenizer,
-                    device=0 if torch.cuda.is_available() else -1,
-                    framework="pt",
-                    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-                )
+                if server_address:
+                    self.summarizer, self.backend = None, 'remote'
+                else:
+                    self.summarizer, self.backend = build_summarizer(
+                        INFERENCE_BACKEND,
+                        self.model,
+                        # The scheduler thread tokenizes with its own copy
+                        copy.deepcopy(self.tokenizer),
+                        model_name,
+                        token=HUGGINGFACE_API_KEY
+                    )
+                    # Quantized/ONNX backends replace the float32 weights, which can then be freed
+                    self.model = self.summarizer.model
             except Exception as e:
                 logging.error(f"Error creating pipeline: {str(e)}")
                 raise RuntimeError(f"Failed to create summarization pipeline: {str(e)}")
 
-            # Depth-based summary configuration with refined parameters
+            # Depth-based decoding plans; shallow depths decode greedily so most requests stay cheap
             self.depth_configs = {
                 0.0: {  # Minimal
                     'max_length_ratio': 0.05,
                     'min_length_ratio': 0.02,
-                    'num_beams': 2,
-                    'length_penalty': 0.6,
+                    'num_beams': 1,
+                    'length_penalty': 1.0,
+                    'no_repeat_ngram_size': 3,
                     'description': 'Bare essentials (5-10% retained)',
                     'detail_retained': '5-10%'
                 },
                 1.0: {  # Short
                     'max_length_ratio': 0.15,
                     'min_length_ratio': 0.05,
-                    'num_beams': 3,
+                    'num_beams': 2,
                     'length_penalty': 0.8,
+                    'no_repeat_ngram_size': 3,
                     'description': 'Key points (10-20% retained)',
                     'detail_retained': '10-20%'
                 },
                 2.0: {  # Medium
                     'max_length_ratio': 0.3,
                     'min_length_ratio': 0.1,
-                    'num_beams': 4,
+                    'num_beams': 3,
                     'length_penalty': 1.0,
+                    'no_repeat_ngram_size': 3,
                     'description': 'Comprehensive overview (20-30% retained)',
                     'detail_retained': '20-30%'
                 },
                 3.0: {  # Standard
                     'max_length_ratio': 0.4,
                     'min_length_ratio': 0.2,
-                    'num_beams': 5,
+                    'num_beams': 4,
                     'length_penalty': 1.1,
+                    'no_repeat_ngram_size': 3,
                     'description': 'Detailed summary (30-40% retained)',
                     'detail_retained': '30-40%'
                 },
                 4.0: {  # Comprehensive
                     'max_length_ratio': 0.6,
                     'min_length_ratio': 0.3,
-                    'num_beams': 6,
+                    'num_beams': 4,
                     'length_penalty': 1.2,
+                    'no_repeat_ngram_size': 3,
                     'description': 'Full detailed summary (40-60% retained)',
                     'detail_retained': '40-60%'
                 }
             }
             
-            self.max_chunk_size = 1024
+            self.max_chunk_size = min(1024, self.tokenizer.model_max_length)
+            self.chunk_overlap = CHUNK_OVERLAP_TOKENS
             self.min_chunk_size = 10
-            self.batch_size = 4 if torch.cuda.is_available() else 1
+            self.batch_size = INFERENCE_BATCH_SIZE
             self.max_length_ratio = 0.4
             self.min_length_ratio = 0.1
             self.lock = Lock()
-            self.executor = ThreadPoolExecutor(max_workers=3)
 
-            # Add error handling for NLTK downloads
-            try:
-                nltk.download('punkt', quiet=True)
-                nltk.download('averaged_perceptron_tagger', quiet=True)
-                nltk.download('stopwords', quiet=True)
-            except Exception as e:
-                logging.warning(f"Error downloading NLTK data: {str(e)}")
-                # Continue anyway as the downloads might already exist
+            self.chunk_cache = get_chunk_cache()
 
-            logging.info(f"Summarization model initialized successfully on {self.device}")
+            # All generate_summary callers share one micro-batching queue, here or in the model server
+            if server_address:
+                self.scheduler = ModelServerClient(server_address)
+            else:
+                self.scheduler = InferenceScheduler(
+                    self.summarizer, max_batch_size=self.batch_size,
+                    under_pressure=self.memory_manager.under_pressure
+                )
+            self.resident_bytes = 0 if server_address else self._model_memory_bytes()
+            if self.resident_bytes:
+                adjust_memory_baseline(self.resident_bytes)
+                MODEL_MEMORY_BYTES.set(self.resident_bytes)
+
+            # NLTK data comes from the local bundle; never block startup on a download
+            use_local_nltk_data()
+
+            logging.info(f"Summarization model initialized successfully on {self.device} ({self.backend} backend)")
         except Exception as e:
             logging.error(f"Error initializing SummarizationModel: {str(e)}")
             raise
 
+    def _model_memory_bytes(self) -> int:
+        """Size of the loaded weights, or the RSS growth while loading for backends without torch parameters."""
+        try:
+            return sum(
+                tensor.numel() * tensor.element_size()
+                for tensor in list(self.model.parameters()) + list(self.model.buffers())
+            )
+        except Exception:
+            return max(0, self.memory_manager.get_memory_usage() - self._rss_at_init)
+
+    def _load_mmap_model(self, model_name: str):
+        """
+        Build the model on the meta device and assign weights memory-mapped from a checkpoint.
+        
+        The checkpoint is written once from the Hugging Face weights. Tensors loaded
+        with mmap=True stay backed by the page cache, so independent workers map the
+        same read-only pages instead of each holding a private copy.
+        """
+        path = os.path.join(MODEL_MMAP_DIR, model_name.replace('/', '--') + '.pt')
+        if not os.path.exists(path):
+            logging.info(f"Writing memory-mappable checkpoint for {model_name} to {path}")
+            os.makedirs(MODEL_MMAP_DIR, exist_ok=True)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name, token=HUGGINGFACE_API_KEY)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(model.state_dict(), tmp_path)
+            os.replace(tmp_path, path)
+            del model
+            gc.collect()
+
+        config = AutoConfig.from_pretrained(model_name, token=HUGGINGFACE_API_KEY)
+        with torch.device('meta'):
+            model = AutoModelForSeq2SeqLM.from_config(config)
+        state_dict = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+        model.load_state_dict(state_dict, assign=True)
+        model.tie_weights()
+        if any(tensor.is_meta for tensor in list(model.parameters()) + list(model.buffers())):
+            raise RuntimeError(f"Checkpoint {path} does not cover every weight of {model_name}")
+        try:
+            model.generation_config = GenerationConfig.from_pretrained(model_name, token=HUGGINGFACE_API_KEY)
+        except OSError:
+            pass
+        return model.eval()
+
+    def warm_up(self):
+        """Run one real generation so lazy kernel and allocator setup happens before the first request."""
+        start_time = time.time()
+        cleaned_text = self.preprocess_text(_WARMUP_TEXT)
+        self.scheduler.submit(cleaned_text, **self._generation_params(cleaned_text, 0.0)).result()
+        served_model = getattr(self.scheduler, 'server_info', {}).get('model_name', self.model_name)
+        if served_model != self.model_name:
+            logging.warning(f"Model server runs {served_model} but this worker tokenizes for {self.model_name}")
+        logging.info(f"Model warm-up finished in {time.time() - start_time:.2f}s")
+
     def clean_text(self, text: str) -> str:
         """Enhanced text cleaning with advanced filtering."""
         if not isinstance(text, str):
@@ -228,163 +497,542 @@ class SummarizationModel:
         text = re.sub(r'[ ]+', ' ', text)
         return text.strip()
 
-    def optimize_length_params(self, text: str, summary_depth: float = 1.0) -> tuple[int, int]:
+    def depth_bucket(self, summary_depth: float) -> float:
+        """The depth_configs key closest to summary_depth."""
+        return min(self.depth_configs, key=lambda depth: abs(depth - summary_depth))
+
+    def depth_config(self, summary_depth: float) -> Dict:
+        """Decoding plan of the depth_configs entry closest to summary_depth."""
+        return self.depth_configs[self.depth_bucket(summary_depth)]
+
+    def optimize_length_params(self, text: str, summary_depth: float = 1.0,
+                               input_length: Optional[int] = None) -> tuple[int, int]:
         """
         Dynamically optimize summary length parameters based on input characteristics.
         
         Args:
             text (str): Input text
             summary_depth (float): Summary depth
+            input_length (int): Input size to scale, e.g. a token count; defaults to the word count
         
         Returns:
-            tuple[int, int]: Maximum and minimum length for summarization
+            tuple[int, int]: Maximum and minimum length for summarization, in the units of input_length
         """
-        input_length = len(text.split())
-        max_length_ratio = min(summary_depth, 0.4)
-        min_length_ratio = min(max_length_ratio * 0.5, 0.1)  # Ensure min_length is less than max_length
+        config = self.depth_config(summary_depth)
+        if input_length is None:
+            input_length = len(text.split())
 
-        max_length = max(int(input_length * max_length_ratio), 5)
-        min_length = max(int(input_length * min_length_ratio), 1)
+        max_length = max(int(input_length * config['max_length_ratio']), 5)
+        min_length = max(int(input_length * config['min_length_ratio']), 1)
 
         # Ensure min_length is always less than max_length
         min_length = min(min_length, max_length - 1)
 
         return max_length, min_length
 
-    def generate_summary(self, text: str, summary_depth: float = 1.0) -> str:
+    def _generation_params(self, cleaned_text: str, summary_depth: float,
+                           max_new_tokens_cap: Optional[int] = None) -> Optional[Dict]:
+        """
+        Build generation parameters for an already preprocessed text.
+        
+        Length budgets are new-token counts derived from the text's token count, and
+        the decoding strategy comes from the depth_configs entry for summary_depth.
+        
+        Args:
+            cleaned_text (str): Preprocessed input text
+            summary_depth (float): Summary depth from 0.0 to 4.0
+            max_new_tokens_cap (int): Upper bound on the summary length, e.g. to make a reduce level converge
+        
+        Returns:
+            Optional[Dict]: Keyword arguments for the summarizer, or None if the text is too short to summarize
+        """
+        # Handle very short inputs
+        if len(cleaned_text.split()) <= 10:
+            return None
+
+        config = self.depth_config(summary_depth)
+        input_tokens = min(
+            len(self._encode(cleaned_text)['input_ids']),
+            self.max_chunk_size
+        )
+        max_new_tokens, min_new_tokens = self.optimize_length_params(cleaned_text, summary_depth, input_tokens)
+
+        # Round to multiples of 16 so chunks of similar size share a scheduler batch
+        max_new_tokens = -(-max_new_tokens // 16) * 16
+        min_new_tokens = min_new_tokens // 16 * 16
+        if max_new_tokens_cap is not None and max_new_tokens > max_new_tokens_cap:
+            max_new_tokens = max_new_tokens_cap // 16 * 16 or max_new_tokens_cap
+            min_new_tokens = min(min_new_tokens, max_new_tokens - 1)
+
+        params = {
+            'max_new_tokens': max_new_tokens,
+            'min_new_tokens': min_new_tokens,
+            'num_beams': config['num_beams'],
+            'no_repeat_ngram_size': config['no_repeat_ngram_size'],
+            'do_sample': False
+        }
+        if config['num_beams'] > 1:
+            params['length_penalty'] = config['length_penalty']
+            params['early_stopping'] = True
+        return params
+
+    def _summary_text(self, summary_result, cleaned_text: str) -> Tuple[str, bool]:
+        """Pull the summary out of a pipeline result, falling back to the input text; also whether it is real."""
+        if summary_result and isinstance(summary_result, dict):
+            summary_text = summary_result.get('summary_text', '')
+            if summary_text:
+                return summary_text, True
+        return cleaned_text, False
+
+    def generate_summary(self, text: str, summary_depth: float = 1.0, owner: Optional[str] = None) -> str:
         """
         Generate summary with improved handling of short inputs and length constraints.
         
         Args:
             text (str): Input text to summarize
             summary_depth (float): Summary depth from 0.0 to 4.0
+            owner (str): Request id used by the scheduler to share batches fairly
         
         Returns:
             str: Generated summary or original text if summarization is not possible
         """
+        return self._generate(text, summary_depth, owner)[0]
+
+    def _generate(self, text: str, summary_depth: float, owner: Optional[str] = None,
+                  deadline: Optional[float] = None) -> Tuple[str, bool]:
+        """
+        generate_summary, also returning False when the text is a fallback rather than model output.
+
+        Past deadline, a time.time() value, the generation is cancelled and the lead
+        sentences stand in for it, as for chunks of a reduce level.
+        """
+        cleaned_text = text
         try:
             # Clean and preprocess the input text
             cleaned_text = self.preprocess_text(text)
 
-            # Handle very short inputs
-            if len(cleaned_text.split()) <= 10:
-                return cleaned_text
-
-            # Compute dynamic length parameters based on input text
-            max_length, min_length = self.optimize_length_params(cleaned_text, summary_depth)
-
-            # Additional safety check
-            if min_length >= max_length:
-                min_length = max(1, max_length // 2)
+            params = self._generation_params(cleaned_text, summary_depth)
+            if params is None:
+                # Too short to summarize; the text is its own summary
+                return cleaned_text, True
 
             # Generate the summary
             try:
-                summary_result = self.summarizer(
-                    cleaned_text,
-                    max_length=max_length,
-                    min_length=min_length,
-                    num_beams=4,
-                    length_penalty=1.0
-                )
-
-                if summary_result and isinstance(summary_result, list) and summary_result:
-                    summary_text = summary_result[0].get('summary_text', '')
-                    return summary_text if summary_text else cleaned_text
-                else:
-                    return cleaned_text
+                submitted_at = time.time()
+                future = self.scheduler.submit(cleaned_text, owner=owner, **params)
+                try:
+                    summary_result = future.result(
+                        timeout=None if deadline is None else max(0.0, deadline - time.time())
+                    )
+                except FuturesTimeoutError:
+                    future.cancel()
+                    logging.warning("Final pass time budget exhausted, using fallback summary")
+                    return self._fallback_summary(cleaned_text, summary_depth), False
+                GENERATION_SECONDS.observe(time.time() - submitted_at, depth=self.depth_bucket(summary_depth))
+                return self._summary_text(summary_result, cleaned_text)
             except Exception as e:
                 logging.error(f"Summarization pipeline error: {str(e)}")
-                return cleaned_text
+                return cleaned_text, False
 
         except Exception as e:
             logging.error(f"Error in generate_summary: {str(e)}")
-            return cleaned_text
+            return cleaned_text, False
 
-    def chunk_text(self, text: str) -> List[str]:
-        """Improved text chunking with sentence boundary preservation."""
+    def _encode(self, text: Union[str, List[str]], **kwargs) -> Dict:
+        """Tokenize without special tokens or truncation on a request thread."""
+        with self.tokenizer_lock:
+            return self.tokenizer(text, add_special_tokens=False, verbose=False, **kwargs)
+
+    def _sentence_end_offsets(self, text: str) -> List[int]:
+        """Character offsets at which each sentence of text ends."""
+        ends, position = [], 0
+        for sentence in split_sentences(text):
+            start = text.find(sentence, position)
+            if start == -1:
+                continue
+            position = start + len(sentence)
+            ends.append(position)
+        return ends
+
+    def chunk_text(self, text: str, overlap: Optional[int] = None) -> List[str]:
+        """
+        Split text into chunks that fit the model window, cutting on sentence boundaries.
+        
+        Args:
+            text (str): Preprocessed input text
+            overlap (int): Tokens of trailing context repeated at the start of the next
+                chunk, rounded to whole sentences; defaults to self.chunk_overlap
+        
+        Returns:
+            List[str]: Chunks in document order
+        """
+        return list(self.iter_chunks([text], overlap))
+
+    def iter_chunks(self, pieces: Iterable[str], overlap: Optional[int] = None) -> Iterator[str]:
+        """
+        Chunk text arriving as consecutive pieces, yielding each chunk as soon as it is cut.
+        
+        The text is tokenized in slices of about CHUNK_SLICE_CHARS with the fast
+        tokenizer; the offset mapping turns sentence end positions into token indices,
+        so chunking is linear in the number of tokens. Only chunks that end well inside
+        a slice are cut from it; the text from the last cut on is carried into the next
+        slice, so slicing never moves a chunk boundary and memory stays bounded however
+        long the document is. A sentence longer than the window is cut mid-sentence, and
+        if sentence splitting fails the text is cut into fixed token windows; a text
+        longer than the window never comes back as a single chunk.
+        
+        Args:
+            pieces (Iterable[str]): Preprocessed input text, in order
+            overlap (int): Tokens of trailing context repeated at the start of the next
+                chunk, rounded to whole sentences; defaults to self.chunk_overlap
+        
+        Returns:
+            Iterator[str]: Chunks in document order
+        """
+        overlap = self.chunk_overlap if overlap is None else overlap
+        budget = self.max_chunk_size - self.tokenizer.num_special_tokens_to_add()
+
+        pieces = iter(pieces)
+        text, position, exhausted = "", 0, False
+        slice_chars = max(CHUNK_SLICE_CHARS, 1)
+        while True:
+            parts, size = [], len(text) - position
+            while not exhausted and size < slice_chars:
+                piece = next(pieces, None)
+                if piece is None:
+                    exhausted = True
+                elif piece:
+                    parts.append(piece)
+                    size += len(piece)
+            if parts:
+                text, position = text[position:] + "".join(parts), 0
+
+            final = exhausted and len(text) - position <= slice_chars
+            if final:
+                end = len(text)
+            else:
+                # End the slice on whitespace so no token is split across slices
+                limit = position + slice_chars
+                end = max(text.rfind(' ', position + slice_chars // 2, limit),
+                          text.rfind('\n', position + slice_chars // 2, limit))
+                end = end if end > position else limit
+            window = text[position:end]
+            if not window:
+                return
+
+            consumed = yield from self._chunk_slice(window, budget, overlap, final)
+            if final:
+                return
+            if consumed:
+                position += consumed
+            else:
+                # Not even one chunk ended inside the slice; widen it rather than stall
+                slice_chars *= 2
+
+    def _chunk_slice(self, text: str, budget: int, overlap: int, final: bool):
+        """
+        Yield the chunks cut from one slice of text.
+
+        A slice that is not the last only yields chunks whose window ends before the
+        slice does. Returns the character offset the next slice starts at.
+        """
+        encoding = self._encode(text, return_offsets_mapping=True)
+        offsets = encoding['offset_mapping']
+        total = len(offsets)
+        if not total:
+            return len(text)
+        if final and total <= budget:
+            yield text
+            return len(text)
+
+        # Token index at which each sentence boundary falls
+        token_starts = [start for start, _ in offsets]
         try:
-            if not text:
-                return []
+            boundaries = sorted({bisect_left(token_starts, end) for end in self._sentence_end_offsets(text)})
+        except Exception as e:
+            logging.error(f"Sentence splitting failed, chunking on fixed token windows: {str(e)}")
+            boundaries = []
+        # Where a slice is cut is not a sentence end, so only the last slice ends on one
+        boundaries = [boundary for boundary in boundaries if 0 < boundary < total] + ([total] if final else [])
+        del encoding, token_starts
+
+        start = 0
+        while start < total:
+            limit = start + budget
+            if not final and limit + budget >= total:
+                # The chunk and the one after it, which decides the overlap, may run past the slice
+                break
+            if limit >= total:
+                end = total
+            else:
+                index = bisect_right(boundaries, limit) - 1
+                end = boundaries[index] if index >= 0 and boundaries[index] > start else limit
+
+            yield text[offsets[start][0]:offsets[end - 1][1]]
+            if end >= total:
+                return len(text)
 
-            sentences = nltk.sent_tokenize(text)
-            chunks, current_chunk, current_length = [], [], 0
+            next_start = end
+            if overlap > 0:
+                # Back up to a sentence boundary, but only if the next sentence still fits after it
+                candidate = boundaries[bisect_left(boundaries, end - overlap)] if boundaries and end - overlap <= boundaries[-1] else end
+                following_index = bisect_right(boundaries, end)
+                # Past the last boundary of a slice the next sentence ends beyond the window anyway
+                following = boundaries[following_index] if following_index < len(boundaries) else total
+                if start < candidate < end and following - candidate <= budget:
+                    next_start = candidate
+            start = next_start
 
-            for sentence in sentences:
-                sentence_length = len(self.tokenizer.encode(sentence))
-                if current_length + sentence_length > self.max_chunk_size:
-                    if current_chunk:
-                        chunks.append(' '.join(current_chunk))
-                        current_chunk, current_length = [], 0
-                current_chunk.append(sentence)
-                current_length += sentence_length
+        return offsets[start][0]
 
-            if current_chunk:
-                chunks.append(' '.join(current_chunk))
+    def _fallback_summary(self, text: str, summary_depth: float) -> str:
+        """Cheap lead-based stand-in for a chunk that could not be summarized in time."""
+        max_length, _ = self.optimize_length_params(text, summary_depth)
+        return ' '.join(text.split()[:max_length])
 
-            return chunks or [text]
+    def extractive_prefilter(self, text: str, summary_depth: float) -> str:
+        """
+        Shrink a long text to its highest ranked sentences before abstractive generation.
+        
+        The token budget grows with summary_depth, so shallow summaries of long reports
+        send only a few windows of salient sentences to the model.
         
+        Args:
+            text (str): Preprocessed input text
+            summary_depth (float): Summary depth from 0.0 to 4.0
+        
+        Returns:
+            str: Selected sentences in document order, or text unchanged if it fits the budget
+        """
+        try:
+            token_budget = int(self.max_chunk_size * EXTRACTIVE_BUDGET_WINDOWS * (1 + max(summary_depth, 0.0)))
+            return select_sentences(
+                text,
+                token_budget,
+                lambda sentences: [len(ids) for ids in self._encode(sentences)['input_ids']]
+            )
         except Exception as e:
-            logging.error(f"Error in chunk_text: {str(e)}")
-            return [text]
+            logging.error(f"Error in extractive_prefilter: {str(e)}")
+            return text
+
+    def _report_dedup(self, stage: str, removed: List[str]):
+        """Count and log the tokens a dedup stage kept away from the model."""
+        if not removed:
+            return
+        tokens = sum(len(ids) for ids in self._encode(removed)['input_ids'])
+        DEDUP_REMOVED_TOKENS.inc(tokens, stage=stage)
+        logging.info(f"Dedup removed {tokens} tokens in {len(removed)} repeated {stage}")
+
+    def _level_token_cap(self, chunk_count: int, levels_left: int) -> int:
+        """
+        Longest chunk summary, in tokens, that lets chunk_count chunks reduce to one window in levels_left levels.
+
+        Each level has to divide the number of windows by chunk_count ** (1 / levels_left),
+        so the last level caps every summary at a share of one window.
+        """
+        window = self.max_chunk_size - self.tokenizer.num_special_tokens_to_add()
+        return max(1, int(window * REDUCE_WINDOW_FILL / chunk_count ** (1.0 / max(levels_left, 1))))
+
+    def _reduce_level(self, chunks: List[str], summary_depth: float, deadline: float,
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      partial_callback: Optional[Callable[[int, str], None]] = None,
+                      owner: Optional[str] = None,
+                      max_new_tokens_cap: Optional[int] = None) -> Tuple[List[str], bool]:
+        """
+        Summarize one level of the map-reduce hierarchy.
+        
+        All chunks are queued on the scheduler at once so they run as batches. Chunks
+        still pending when the level's deadline passes are cancelled and replaced by
+        their lead sentences so the level always produces one summary per chunk.
+        
+        Args:
+            chunks (List[str]): Chunks that each fit the model window
+            summary_depth (float): Summary depth from 0.0 to 4.0
+            deadline (float): time.time() value by which this level must finish
+            progress_callback (Callable): Called with (chunks done, chunks added) increments
+            partial_callback (Callable): Called with (chunk index, summary) as each chunk finishes
+            owner (str): Request id used by the scheduler to share batches fairly
+            max_new_tokens_cap (int): Upper bound on every chunk summary's length
+        
+        Returns:
+            Tuple[List[str], bool]: Chunk summaries in document order, and False if any is a fallback
+        """
+        summaries = [None] * len(chunks)
+        complete = True
+        futures = {}
+
+        for index, chunk in enumerate(chunks):
+            cleaned_chunk = self.preprocess_text(chunk)
+            params = self._generation_params(cleaned_chunk, summary_depth, max_new_tokens_cap)
+            if params is None:
+                summaries[index] = cleaned_chunk
+                if partial_callback:
+                    partial_callback(index, cleaned_chunk)
+                continue
+
+            # Unchanged chunks of an edited document reuse their earlier summaries; the cap is part of the key
+            cache_key = self.chunk_cache.make_key(
+                f"{params['max_new_tokens']}|{cleaned_chunk}", self.model_name, summary_depth
+            )
+            cached_summary = self.chunk_cache.get(cache_key)
+            if cached_summary is not None:
+                summaries[index] = cached_summary
+                if partial_callback:
+                    partial_callback(index, cached_summary)
+                continue
+            future = self.scheduler.submit(cleaned_chunk, owner=owner, **params)
+            futures[future] = (index, cleaned_chunk, cache_key, time.time())
+
+        if progress_callback:
+            progress_callback(len(chunks) - len(futures), len(chunks))
 
-    def summarize_long_document(self, text: str, summary_depth: float = 1.0, max_time: int = 900) -> str:
-        """Handle long documents with improved chunking and multi-stage summarization."""
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.time())):
+                pending.discard(future)
+                index, cleaned_chunk, cache_key, submitted_at = futures[future]
+                try:
+                    summaries[index], generated = self._summary_text(future.result(), cleaned_chunk)
+                    GENERATION_SECONDS.observe(time.time() - submitted_at, depth=self.depth_bucket(summary_depth))
+                    if generated:
+                        self.chunk_cache.put(cache_key, summaries[index])
+                    complete = complete and generated
+                except Exception as e:
+                    logging.error(f"Error processing chunk: {str(e)}")
+                    summaries[index] = self._fallback_summary(cleaned_chunk, summary_depth)
+                    complete = False
+                if partial_callback:
+                    partial_callback(index, summaries[index])
+                if progress_callback:
+                    progress_callback(1, 0)
+        except FuturesTimeoutError:
+            logging.warning(f"Level time budget exhausted, {len(pending)}/{len(chunks)} chunks use fallback summaries")
+
+        for future in pending:
+            future.cancel()
+            index, cleaned_chunk, _, _ = futures[future]
+            summaries[index] = self._fallback_summary(cleaned_chunk, summary_depth)
+            if partial_callback:
+                partial_callback(index, summaries[index])
+        if pending:
+            complete = False
+            if progress_callback:
+                progress_callback(len(pending), 0)
+
+        return [summary for summary in summaries if summary], complete
+
+    def _final_pass(self, text: str, summary_depth: float,
+                    progress_callback: Optional[Callable[[int, int], None]] = None,
+                    owner: Optional[str] = None, deadline: Optional[float] = None) -> Tuple[str, bool]:
+        """Summarize text that fits one window by deadline, counting it as one chunk of progress."""
+        if progress_callback:
+            progress_callback(0, 1)
+        summary, generated = self._generate(text, summary_depth, owner, deadline)
+        if progress_callback:
+            progress_callback(1, 0)
+        return summary, generated
+
+    def summarize_long_document(self, text: str, summary_depth: float = 1.0, max_time: float = SUMMARY_TIME_BUDGET,
+                                progress_callback: Optional[Callable[[int, int], None]] = None,
+                                partial_callback: Optional[Callable[[int, int, str], None]] = None) -> str:
+        """Summarize a document of any length; summarize_document without the completion flag."""
+        return self.summarize_document(text, summary_depth, max_time, progress_callback, partial_callback)[0]
+
+    def summarize_document(self, text: str, summary_depth: float = 1.0, max_time: float = SUMMARY_TIME_BUDGET,
+                           progress_callback: Optional[Callable[[int, int], None]] = None,
+                           partial_callback: Optional[Callable[[int, int, str], None]] = None) -> Tuple[str, bool]:
+        """
+        Summarize a document of any length with hierarchical map-reduce.
+        
+        The text is split into token-bounded chunks, every chunk is summarized in
+        parallel batches, and the joined chunk summaries are chunked and reduced
+        again until they fit a single model window. Each level gets half of the
+        remaining time budget so the whole run finishes within ``max_time``, and
+        caps its summaries so that the text fits one window by the last level.
+        A document that still does not fit is summarized from its first window
+        and reported as incomplete.
+        
+        Args:
+            text (str): Input document text
+            summary_depth (float): Summary depth from 0.0 to 4.0
+            max_time (float): Total time budget in seconds
+            progress_callback (Callable): Called with (chunks done, chunks added) increments
+            partial_callback (Callable): Called with (level, chunk index, summary) as each chunk finishes
+        
+        Returns:
+            Tuple[str, bool]: Final summary, and True only if every part of it came from the
+                model; error messages and time-budget fallbacks return False and must not be cached
+        """
         try:
             start_time = time.time()
+            complete = True
             
             # Add input validation
             if not text or not isinstance(text, str):
-                return "Invalid input document"
+                return "Invalid input document", False
                 
+            if DEDUP_ENABLED:
+                # Line structure is gone after preprocessing, so boilerplate lines go first
+                text, removed_lines = drop_repeated_lines(text)
+                self._report_dedup('lines', removed_lines.splitlines())
+
             cleaned_text = self.preprocess_text(text)
             if not cleaned_text:
-                return "Empty or invalid document"
-                
-            # Check if document needs chunking
-            if len(cleaned_text.split()) <= self.max_chunk_size:
-                return self.generate_summary(cleaned_text, summary_depth)
-                
-            chunks = self.chunk_text(cleaned_text)
-            if not chunks:
-                return "Unable to process document"
-                
-            chunk_summaries = []
-            with ThreadPoolExecutor() as executor:
-                futures = []
-                
-                # Submit chunks for processing
-                for chunk in chunks:
-                    if time.time() - start_time > max_time:
-                        break
-                    futures.append(executor.submit(self.generate_summary, chunk, summary_depth))
-                
-                # Collect results with timeout handling
-                for future in as_completed(futures):
-                    try:
-                        if time.time() - start_time > max_time:
-                            break
-                        summary = future.result(timeout=30)
-                        if summary and not summary.startswith("Error"):
-                            chunk_summaries.append(summary)
-                    except Exception as e:
-                        logging.error(f"Error processing chunk: {str(e)}")
-                        continue
-                        
-            # Process collected summaries
-            if len(chunk_summaries) > 1:
-                try:
-                    return self.generate_summary(" ".join(chunk_summaries), summary_depth)
-                except Exception as e:
-                    logging.error(f"Error in final summary generation: {str(e)}")
-                    return " ".join(chunk_summaries)  # Fallback to concatenated summaries
-            elif chunk_summaries:
-                return chunk_summaries[0]
-            else:
-                return "Unable to generate summary"
+                return "Empty or invalid document", False
+
+            if EXTRACTIVE_PREFILTER:
+                cleaned_text = self.extractive_prefilter(cleaned_text, summary_depth)
+
+            # Every chunk of this document shares one fair-share slot in the scheduler
+            owner = uuid.uuid4().hex
+            current_text = cleaned_text
+            for level in range(MAX_REDUCE_LEVELS):
+                chunks = self.chunk_text(current_text)
+                if not chunks:
+                    return "Unable to process document", False
+                if DEDUP_ENABLED:
+                    chunks, dropped_chunks = collapse_near_duplicates(chunks)
+                    self._report_dedup('chunks', dropped_chunks)
+                if level == 0:
+                    CHUNKS_PER_DOCUMENT.observe(len(chunks))
+
+                # Fits one window: final pass
+                if len(chunks) == 1:
+                    summary, generated = self._final_pass(
+                        chunks[0], summary_depth, progress_callback, owner, start_time + max_time
+                    )
+                    return summary, complete and generated
+
+                remaining = max_time - (time.time() - start_time)
+                level_deadline = time.time() + remaining / 2
+                chunk_summaries, level_complete = self._reduce_level(
+                    chunks, summary_depth, level_deadline, progress_callback,
+                    partial(partial_callback, level) if partial_callback else None,
+                    owner, self._level_token_cap(len(chunks), MAX_REDUCE_LEVELS - level)
+                )
+                logging.info(
+                    f"Reduce level {level}: {len(chunks)} chunks -> {len(chunk_summaries)} summaries "
+                    f"in {time.time() - start_time:.2f}s"
+                )
+
+                if not chunk_summaries:
+                    return "Unable to generate summary", False
+                complete = complete and level_complete
+                current_text = " ".join(chunk_summaries)
+
+            chunks = self.chunk_text(current_text)
+            if len(chunks) > 1:
+                # Only possible when retokenized summaries outgrow their caps; never pass it off as whole
+                logging.warning(f"Level cap reached with {len(chunks)} windows left, summarizing the first")
+                complete = False
+            summary, generated = self._final_pass(
+                chunks[0] if chunks else current_text, summary_depth, progress_callback, owner, start_time + max_time
+            )
+            return summary, complete and generated
                 
         except Exception as e:
-            logging.error(f"Error in summarize_long_document: {str(e)}")
-            return f"Error summarizing document: {str(e)}"
+            logging.error(f"Error in summarize_document: {str(e)}")
+            return f"Error summarizing document: {str(e)}", False
 
     def __call__(self, text: str, summary_depth: float = 0.3) -> str:
         """Enhanced call method with automatic handling of document length."""
@@ -392,30 +1040,96 @@ class SummarizationModel:
             if not text or not isinstance(text, str):
                 return "Invalid input text"
                 
-            word_count = len(text.split())
-            if word_count > self.max_chunk_size:
-                return self.summarize_long_document(text, summary_depth)
-            return self.generate_summary(text, summary_depth)
+            # Token-based chunking decides whether the text needs more than one window
+            return self.summarize_long_document(text, summary_depth)
         except Exception as e:
             logging.error(f"Error in __call__: {str(e)}")
             return f"Error processing text: {str(e)}"
 
 # Singleton instance creation with improved error handling
 _model_lock = Lock()
-_summarization_model = None
+_model_cache = None
+
+def get_model_cache() -> ModelCache:
+    """Get or create the process-wide model registry."""
+    global _model_cache
+    with _model_lock:
+        if _model_cache is None:
+            _model_cache = ModelCache(server_address=MODEL_SERVER_SOCKET or None)
+        return _model_cache
 
-def get_model():
-    """Get or create singleton instance of SummarizationModel with error handling."""
-    global _summarization_model
+def get_model(model_name: Optional[str] = None):
+    """
+    Get a loaded SummarizationModel, the default route's if model_name is None.
+    
+    The model is not held: request paths should use get_model_cache().use() so
+    it cannot be evicted while they generate.
+    """
     try:
-        with _model_lock:
-            if _summarization_model is None:
-                _summarization_model = SummarizationModel()
-            return _summarization_model
+        model_cache = get_model_cache()
+        with model_cache.use(model_name or model_cache.model_name_for(0.0)) as model:
+            return model
     except Exception as e:
         logging.error(f"Error creating model instance: {str(e)}")
         raise RuntimeError(f"Failed to initialize summarization model: {str(e)}")
 
+# Background loading state, per process
+_warmup_lock = Lock()
+_warmup_pid = None
+_warmup_state = {'state': 'idle', 'error': None}
+
+def _load_and_warm_up():
+    try:
+        model_cache = get_model_cache()
+        route_bytes = 0
+        for model_name in model_cache.model_names():
+            with model_cache.use(model_name) as model:
+                model.warm_up()
+                route_bytes += model.resident_bytes
+        model_cache.check_budget(route_bytes)
+        _warmup_state.update(state='ready', error=None)
+    except Exception as e:
+        logging.error(f"Model warm-up failed: {str(e)}")
+        _warmup_state.update(state='failed', error=str(e))
+
+def start_model_warmup(background: bool = True):
+    """
+    Load every configured model and run a warm-up generation, once per process.
+    
+    Args:
+        background (bool): Load on a daemon thread; False blocks, e.g. in a preloading gunicorn master
+    """
+    global _warmup_pid
+    with _warmup_lock:
+        if _warmup_pid == os.getpid():
+            return
+        _warmup_pid = os.getpid()
+        _warmup_state.update(state='loading', error=None)
+        if background:
+            Thread(target=_load_and_warm_up, name='model-warmup', daemon=True).start()
+            return
+    _load_and_warm_up()
+
+def after_fork():
+    """
+    Re-arm per-process state in a worker forked from a master that preloaded the model.
+    
+    The forked weights stay shared copy-on-write; only the scheduler threads and
+    locks have to be recreated since threads do not survive fork.
+    """
+    global _warmup_pid
+    with _warmup_lock:
+        if _model_cache is not None:
+            _model_cache.after_fork()
+            _warmup_pid = os.getpid()
+
+def model_status() -> Dict:
+    """Loading state of the models in this process: idle, loading, ready or failed, and what is loaded."""
+    return {**_warmup_state, 'models': _model_cache.stats() if _model_cache is not None else {}}
+
+def model_ready() -> bool:
+    return _warmup_state['state'] == 'ready'
+
 if __name__ == "__main__":
     # Test the model with sample texts of varying lengths
     try:
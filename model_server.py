@@ -0,0 +1,238 @@
+"""
+Standalone inference server.
+
+Owns the summarization model and its micro-batching scheduler and serves
+generation requests from web workers over a Unix socket. Web workers then
+only need the tokenizer, so request parsing and extraction can scale out
+across many cheap processes while every chunk is batched in one place.
+
+    MODEL_SERVER_SOCKET=/tmp/sycx_model.sock python model_server.py
+
+With MODEL_SERVER_SOCKET set, gunicorn.conf.py starts this server itself and
+get_model() returns a SummarizationModel whose scheduler is a ModelServerClient.
+"""
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import Future, InvalidStateError
+from functools import partial
+from multiprocessing.connection import Client, Listener
+from multiprocessing import AuthenticationError
+from threading import Lock, Thread
+from typing import Dict, Optional
+
+MODEL_SERVER_SOCKET = os.getenv('MODEL_SERVER_SOCKET', '')
+# Optional shared secret; the socket itself is only accessible to the service user
+MODEL_SERVER_AUTHKEY = os.getenv('MODEL_SERVER_AUTHKEY', '').encode() or None
+# How long a web worker keeps retrying while the server is still loading the model
+MODEL_SERVER_CONNECT_TIMEOUT = float(os.getenv('MODEL_SERVER_CONNECT_TIMEOUT', '600'))
+
+
+class ModelServerClient:
+    """
+    Drop-in replacement for InferenceScheduler that forwards texts to the model server.
+
+    One connection per process carries every request; responses are matched to
+    futures by request id, so many chunks can be in flight and batched together.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = MODEL_SERVER_AUTHKEY,
+                 connect_timeout: float = MODEL_SERVER_CONNECT_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self.lock = Lock()
+        self.connection = None
+        self.futures: Dict[int, Future] = {}
+        self.next_id = 0
+        self.server_info: Dict = {}
+
+    def submit(self, text: str, owner: Optional[str] = None, **generate_kwargs) -> Future:
+        """
+        Send a text to the model server for batched summarization.
+
+        Args:
+            text (str): Text to summarize
+            owner (str): Request id; the server shares batches fairly between owners
+            **generate_kwargs: Generation parameters
+
+        Returns:
+            Future: Resolves to the pipeline output dict for this text
+
+        Raises:
+            ConnectionError: If the server cannot be reached
+        """
+        future = Future()
+        with self.lock:
+            if self.connection is None:
+                self._connect()
+            request_id = self.next_id
+            self.next_id += 1
+            self.futures[request_id] = future
+            try:
+                self.connection.send(('summarize', request_id, text, owner, generate_kwargs))
+            except (OSError, EOFError) as e:
+                self._disconnect(e)
+                raise ConnectionError(f"Lost connection to model server: {str(e)}")
+        future.add_done_callback(partial(self._on_done, request_id))
+        return future
+
+    def shutdown(self, wait: bool = True):
+        with self.lock:
+            self._disconnect(ConnectionError("Model server client shut down"))
+
+    def restart_after_fork(self):
+        """Forked children must open their own connection."""
+        self.lock = Lock()
+        self.connection = None
+        self.futures = {}
+
+    def _connect(self):
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.time() >= deadline:
+                    raise ConnectionError(f"Model server at {self.address} unavailable: {str(e)}")
+                time.sleep(0.5)
+
+        self.server_info = connection.recv()
+        self.connection = connection
+        Thread(target=self._receive, args=(connection,), name='model-server-client', daemon=True).start()
+        logging.info(f"Connected to model server at {self.address}: {self.server_info}")
+
+    def _disconnect(self, error: Exception):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        futures, self.futures = self.futures, {}
+        for future in futures.values():
+            try:
+                future.set_exception(ConnectionError(str(error)))
+            except InvalidStateError:
+                pass
+
+    def _receive(self, connection):
+        while True:
+            try:
+                request_id, ok, payload = connection.recv()
+            except (EOFError, OSError) as e:
+                with self.lock:
+                    if self.connection is connection:
+                        logging.error(f"Model server connection closed: {str(e)}")
+                        self._disconnect(e)
+                return
+
+            with self.lock:
+                future = self.futures.pop(request_id, None)
+            if future is None:
+                continue
+            try:
+                if ok:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RuntimeError(payload))
+            except InvalidStateError:
+                # Cancelled while the server was generating
+                pass
+
+    def _on_done(self, request_id: int, future: Future):
+        if not future.cancelled():
+            return
+        # Let the server drop the text if it has not been batched yet
+        with self.lock:
+            self.futures.pop(request_id, None)
+            if self.connection is not None:
+                try:
+                    self.connection.send(('cancel', request_id))
+                except (OSError, EOFError):
+                    pass
+
+
+class ModelServer:
+    """Accepts web worker connections and feeds their texts into the model's scheduler."""
+
+    def __init__(self, model, address: str, authkey: Optional[bytes] = MODEL_SERVER_AUTHKEY):
+        self.model = model
+        self.address = address
+        self.authkey = authkey
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        logging.info(f"Model server listening on {self.address}")
+
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, OSError, EOFError) as e:
+                logging.warning(f"Rejected model server connection: {str(e)}")
+                continue
+            Thread(target=self._serve, args=(connection,), name='model-server-connection', daemon=True).start()
+
+    def _serve(self, connection):
+        send_lock = Lock()
+        futures: Dict[int, Future] = {}
+
+        def reply(request_id: int, future: Future):
+            futures.pop(request_id, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            message = (request_id, False, str(error)) if error else (request_id, True, future.result())
+            with send_lock:
+                try:
+                    connection.send(message)
+                except (OSError, EOFError):
+                    pass
+
+        try:
+            connection.send({
+                'model_name': self.model.model_name,
+                'backend': self.model.backend,
+                'max_batch_size': self.model.batch_size,
+                'pid': os.getpid()
+            })
+            while True:
+                message = connection.recv()
+                if message[0] == 'summarize':
+                    _, request_id, text, owner, generate_kwargs = message
+                    future = self.model.scheduler.submit(text, owner=owner, **generate_kwargs)
+                    futures[request_id] = future
+                    future.add_done_callback(partial(reply, request_id))
+                elif message[0] == 'cancel':
+                    future = futures.get(message[1])
+                    if future is not None:
+                        future.cancel()
+        except (EOFError, OSError):
+            # The web worker went away; drop whatever it still had queued
+            for future in list(futures.values()):
+                future.cancel()
+        finally:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the summarization model over a Unix socket")
+    parser.add_argument('--socket', default=MODEL_SERVER_SOCKET or '/tmp/sycx_model.sock')
+    parser.add_argument('--model', help="Hugging Face model id or path, SummarizationModel default if omitted")
+    args = parser.parse_args()
+
+    import metrics
+    from model import SummarizationModel
+
+    # The server is the only process running inference, so it gets every core
+    os.environ.setdefault('TORCH_NUM_THREADS', str(os.cpu_count() or 1))
+    model = SummarizationModel(args.model) if args.model else SummarizationModel()
+    model.warm_up()
+    metrics.start_flusher()
+    ModelServer(model, args.socket).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Local NLTK data bundle.
+
+The service only reads NLTK data from NLTK_DATA_DIR and never downloads at
+runtime; build the bundle once at image build time, or before the server
+starts on platforms without a build step, with
+
+    python nltk_setup.py
+
+which returns at once when the bundle is already complete. The web app refuses
+to start without the sentence tokenizer data unless NLTK_DATA_REQUIRED=0.
+"""
+import os
+import logging
+from typing import List
+import nltk
+
+NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+# Without punkt, chunking and sentence ranking fall back to splitting on end punctuation
+NLTK_DATA_REQUIRED = os.getenv('NLTK_DATA_REQUIRED', '1') == '1'
+
+# Resource name -> path checked with nltk.data.find
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger'
+}
+
+
+def use_local_nltk_data(required: bool = False) -> List[str]:
+    """
+    Put the bundle first on the NLTK search path and check it, without touching the network.
+
+    Args:
+        required (bool): Raise instead of warning when the sentence tokenizer cannot load
+
+    Returns:
+        List[str]: Names of resources that could not be found
+
+    Raises:
+        RuntimeError: If required and nltk.sent_tokenize has no data to run on
+    """
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+    missing = []
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(name)
+    if missing:
+        logging.warning(
+            f"NLTK data missing from {NLTK_DATA_DIR}: {', '.join(missing)}; run 'python nltk_setup.py'"
+        )
+    if required:
+        try:
+            # punkt or punkt_tab, depending on the NLTK version
+            nltk.sent_tokenize("Bundle check. Second sentence.")
+        except LookupError:
+            raise RuntimeError(
+                f"NLTK sentence tokenizer data is missing from {NLTK_DATA_DIR}; run 'python nltk_setup.py' "
+                f"before starting, or set NLTK_DATA_REQUIRED=0 to split sentences on punctuation"
+            )
+    return missing
+
+
+def download_nltk_bundle(download_dir: str = NLTK_DATA_DIR) -> bool:
+    """Download every resource in NLTK_RESOURCES into download_dir."""
+    os.makedirs(download_dir, exist_ok=True)
+    return all(nltk.download(name, download_dir=download_dir, quiet=True) for name in NLTK_RESOURCES)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if not use_local_nltk_data():
+        logging.info(f"NLTK data already bundled in {NLTK_DATA_DIR}")
+        raise SystemExit(0)
+    if not download_nltk_bundle():
+        raise SystemExit(f"Failed to download NLTK data into {NLTK_DATA_DIR}")
+    logging.info(f"NLTK data bundled in {NLTK_DATA_DIR}")
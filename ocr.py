@@ -0,0 +1,174 @@
+"""
+OCR for image uploads and scanned PDF pages.
+
+Images are decoded at reduced size, normalized for uneven lighting and
+binarized before recognition; tall images are cut into overlapping strips so
+downscaling never has to shrink the text. Recognition reuses one tesseract
+engine per thread when tesserocr is installed and otherwise falls back to
+pytesseract, which starts a tesseract process per call, so it gets the whole
+page in one call instead of one per strip. Results are cached by image hash
+unless OCR_CACHE_ENABLED is off.
+"""
+import os
+import logging
+import threading
+from typing import Iterator, List, Optional
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps, ImageSequence
+from cache import get_ocr_cache
+
+OCR_LANGUAGE = os.getenv('OCR_LANGUAGE', 'eng')
+# Tesseract page segmentation mode; 3 is fully automatic
+OCR_PSM = int(os.getenv('OCR_PSM', '3'))
+# Images are downscaled to this width; text lines run across it, so height is left to tiling
+OCR_MAX_WIDTH = int(os.getenv('OCR_MAX_WIDTH', '2500'))
+OCR_TILE_HEIGHT = int(os.getenv('OCR_TILE_HEIGHT', '2400'))
+OCR_TILE_OVERLAP = int(os.getenv('OCR_TILE_OVERLAP', '60'))
+# Radius of the blur that estimates the background lighting of photos
+OCR_BACKGROUND_RADIUS = int(os.getenv('OCR_BACKGROUND_RADIUS', '25'))
+# PDF pages with less extracted text than this are treated as scans and rendered for OCR
+OCR_PDF_MIN_CHARS = int(os.getenv('OCR_PDF_MIN_CHARS', '20'))
+OCR_PDF_DPI = int(os.getenv('OCR_PDF_DPI', '200'))
+OCR_SCANNED_PDFS = os.getenv('OCR_SCANNED_PDFS', '1') == '1'
+# Off skips both tiers of the OCR cache, e.g. so repeated benchmark runs time recognition
+OCR_CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', '1') == '1'
+
+_engines = threading.local()
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+def _recognize(image: Image.Image) -> str:
+    """Run tesseract on one prepared image."""
+    if tesserocr is None:
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=OCR_LANGUAGE, config=f'--psm {OCR_PSM}') or ""
+
+    api = getattr(_engines, 'api', None)
+    if api is None:
+        # Loading the language model is most of tesseract's start-up cost; keep the engine
+        api = tesserocr.PyTessBaseAPI(lang=OCR_LANGUAGE, psm=OCR_PSM)
+        _engines.api = api
+    api.SetImage(image)
+    return api.GetUTF8Text() or ""
+
+
+def _otsu_threshold(pixels: np.ndarray) -> int:
+    """Grey level that best separates text from background (Otsu's method)."""
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_below = np.cumsum(histogram)
+    weight_above = weight_below[-1] - weight_below
+    sum_below = np.cumsum(histogram * levels)
+    mean_below = sum_below / np.maximum(weight_below, 1)
+    mean_above = (sum_below[-1] - sum_below) / np.maximum(weight_above, 1)
+    between_variance = weight_below * weight_above * (mean_below - mean_above) ** 2
+    return int(np.argmax(between_variance))
+
+
+def prepare_image(image: Image.Image) -> Image.Image:
+    """
+    Grayscale, downscale and binarize an image for recognition.
+
+    Dividing by a heavily blurred copy flattens the shadows and gradients of
+    phone photos, so one global threshold works across the page.
+    """
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('L')
+    if image.width > OCR_MAX_WIDTH:
+        height = max(1, round(image.height * OCR_MAX_WIDTH / image.width))
+        image = image.resize((OCR_MAX_WIDTH, height), Image.LANCZOS)
+
+    pixels = np.asarray(image, dtype=np.float32)
+    background = np.asarray(image.filter(ImageFilter.BoxBlur(OCR_BACKGROUND_RADIUS)), dtype=np.float32)
+    normalized = np.clip(pixels / np.maximum(background, 1.0) * 255.0, 0, 255).astype(np.uint8)
+    binary = np.where(normalized > _otsu_threshold(normalized), 255, 0).astype(np.uint8)
+    return Image.fromarray(binary, mode='L')
+
+
+def _tiles(image: Image.Image) -> Iterator[Image.Image]:
+    """Full-width strips of at most OCR_TILE_HEIGHT rows, overlapping so no line is only cut in half."""
+    if image.height <= OCR_TILE_HEIGHT:
+        yield image
+        return
+    step = max(OCR_TILE_HEIGHT - OCR_TILE_OVERLAP, 1)
+    for top in range(0, image.height - OCR_TILE_OVERLAP, step):
+        yield image.crop((0, top, image.width, min(top + OCR_TILE_HEIGHT, image.height)))
+
+
+def _join_tiles(texts: List[str]) -> str:
+    """Join strip texts, dropping a line repeated across the overlap of two strips."""
+    lines: List[str] = []
+    for text in texts:
+        tile_lines = [line for line in text.splitlines() if line.strip()]
+        if lines and tile_lines and tile_lines[0].strip() == lines[-1].strip():
+            tile_lines = tile_lines[1:]
+        lines.extend(tile_lines)
+    return "\n".join(lines)
+
+
+def recognize_image(image: Image.Image) -> str:
+    """Prepare, tile and recognize one image or page."""
+    prepared = prepare_image(image)
+    if tesserocr is None:
+        # Without a reusable engine every strip would start its own tesseract process
+        return _join_tiles([_recognize(prepared)])
+    return _join_tiles([_recognize(tile) for tile in _tiles(prepared)])
+
+
+def ocr_image(content) -> str:
+    """
+    Recognize the text of an image upload, every frame of a multi-page TIFF included.
+
+    Args:
+        content: Seekable binary stream of the image file
+
+    Returns:
+        str: Recognized text, one page per paragraph
+    """
+    ocr_cache = get_ocr_cache() if OCR_CACHE_ENABLED else None
+    if ocr_cache is not None:
+        cache_key = ocr_cache.make_key(content, f"tesseract:{OCR_LANGUAGE}:{OCR_PSM}", 0.0)
+        cached_text = ocr_cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
+
+    content.seek(0)
+    with Image.open(content) as image:
+        # JPEG decodes straight to a reduced size, which phone photos rarely survive unscaled anyway
+        if image.format == 'JPEG' and image.width > OCR_MAX_WIDTH:
+            image.draft('L', (OCR_MAX_WIDTH, round(image.height * OCR_MAX_WIDTH / image.width)))
+        pages = [recognize_image(frame) for frame in ImageSequence.Iterator(image)]
+
+    text = "\n\n".join(page for page in pages if page.strip())
+    if ocr_cache is not None:
+        ocr_cache.put(cache_key, text)
+    return text
+
+
+def ocr_pdf_page(path: Optional[str], page_number: int) -> str:
+    """
+    Render one PDF page and recognize it; used for scanned pages pdfminer finds no text on.
+
+    Args:
+        path (str): PDF file path, since poppler renders from disk
+        page_number (int): Zero-based page index
+
+    Returns:
+        str: Recognized text, empty if the page cannot be rendered
+    """
+    if not path:
+        return ""
+    try:
+        from pdf2image import convert_from_path
+    except ImportError:
+        logging.warning("pdf2image is not installed, scanned PDF pages are skipped")
+        return ""
+
+    pages = convert_from_path(
+        path, dpi=OCR_PDF_DPI, first_page=page_number + 1, last_page=page_number + 1, grayscale=True
+    )
+    return "\n\n".join(recognize_image(page) for page in pages)
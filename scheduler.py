@@ -0,0 +1,204 @@
+import os
+import time
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from metrics import BATCH_SECONDS, BATCH_SIZE, INPUT_TOKENS, OUTPUT_TOKENS, QUEUE_WAIT_SECONDS
+
+INFERENCE_BATCH_SIZE = int(os.getenv('INFERENCE_BATCH_SIZE', '4'))
+INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', '20'))
+
+
+class _PendingRequest:
+    """A single text waiting to be summarized together with its result future."""
+
+    __slots__ = ('text', 'future', 'enqueued_at')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Dynamic micro-batching scheduler shared by every summarization caller.
+
+    Pending texts from all concurrent requests are grouped by their generation
+    parameters and handed to the pipeline as one padded batch as soon as the
+    group is full or its oldest entry has waited ``max_wait`` seconds.
+
+    Within a group, texts are queued per owner (one summarization request) and
+    batches are filled round-robin across owners; between groups, the one holding
+    the owner served least recently goes first. A 500-chunk report therefore
+    cannot starve a one-page document submitted after it.
+
+    While ``under_pressure`` reports memory pressure, batches shrink to a single
+    text so padded activations for a whole batch are never allocated at once.
+    """
+
+    def __init__(self, summarizer: Callable, max_batch_size: int = INFERENCE_BATCH_SIZE,
+                 max_wait: float = INFERENCE_MAX_WAIT_MS / 1000.0,
+                 under_pressure: Optional[Callable[[], bool]] = None):
+        self.summarizer = summarizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.under_pressure = under_pressure
+        self._start()
+
+    def _start(self):
+        self.pending: Dict[Tuple, OrderedDict] = {}
+        self.sizes: Dict[Tuple, int] = {}
+        # Batch number at which each owner with pending texts was last served
+        self.served: Dict[Hashable, int] = {}
+        self.batches = 0
+        self.condition = Condition()
+        self.running = True
+        self.worker = Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self.worker.start()
+
+    def restart_after_fork(self):
+        """Give a forked child its own lock and worker thread; threads do not survive fork."""
+        self._start()
+
+    def submit(self, text: str, owner: Optional[Hashable] = None, **generate_kwargs) -> Future:
+        """
+        Queue a text for batched summarization.
+
+        Args:
+            text (str): Text to summarize
+            owner (Hashable): Request the text belongs to, for fair sharing between requests
+            **generate_kwargs: Generation parameters (max_new_tokens, num_beams, ...)
+
+        Returns:
+            Future: Resolves to the pipeline output dict for this text
+        """
+        request = _PendingRequest(text)
+        key = tuple(sorted(generate_kwargs.items()))
+        with self.condition:
+            if not self.running:
+                raise RuntimeError("Inference scheduler is shut down")
+            self.pending.setdefault(key, OrderedDict()).setdefault(owner, deque()).append(request)
+            self.sizes[key] = self.sizes.get(key, 0) + 1
+            self.condition.notify()
+        return request.future
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work, drain what is already queued and stop the worker."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if wait:
+            self.worker.join()
+
+    def _oldest(self, key: Tuple) -> float:
+        return min(queue[0].enqueued_at for queue in self.pending[key].values())
+
+    def _batch_limit(self) -> int:
+        if self.under_pressure is not None and self.under_pressure():
+            return 1
+        return self.max_batch_size
+
+    def _take(self, key: Tuple, limit: int) -> List[_PendingRequest]:
+        """Pop up to limit texts of a group, one per owner in turn."""
+        group = self.pending[key]
+        batch = []
+        while group and len(batch) < limit:
+            for owner in list(group):
+                if len(batch) >= limit:
+                    break
+                queue = group[owner]
+                batch.append(queue.popleft())
+                self.served[owner] = self.batches
+                # Owners just served go to the back so the next batch starts with the others
+                if queue:
+                    group.move_to_end(owner)
+                else:
+                    del group[owner]
+
+        self.batches += 1
+        self.sizes[key] -= len(batch)
+        if not group:
+            del self.pending[key]
+            del self.sizes[key]
+        # Forget owners with nothing left queued so the table does not grow without bound
+        for owner in [owner for owner in self.served if not any(owner in other for other in self.pending.values())]:
+            del self.served[owner]
+        return batch
+
+    def _next_batch(self) -> Optional[Tuple[Tuple, List[_PendingRequest]]]:
+        """Block until a batch is ready to run; returns None once shut down and drained."""
+        with self.condition:
+            while True:
+                if not self.pending:
+                    if not self.running:
+                        return None
+                    self.condition.wait()
+                    continue
+
+                # Among groups that are full or have waited max_wait, serve the one whose
+                # least recently served owner has waited longest, then the oldest text
+                now = time.monotonic()
+                limit = self._batch_limit()
+                heads = {key: self._oldest(key) for key in self.pending}
+                ready = [
+                    key for key in self.pending
+                    if self.sizes[key] >= limit or now - heads[key] >= self.max_wait or not self.running
+                ]
+                if ready:
+                    key = min(ready, key=lambda k: (
+                        min(self.served.get(owner, -1) for owner in self.pending[k]), heads[k]
+                    ))
+                    return key, self._take(key, limit)
+
+                self.condition.wait(self.max_wait - (now - min(heads.values())))
+
+    def _run(self):
+        while True:
+            next_batch = self._next_batch()
+            if next_batch is None:
+                return
+            self._dispatch(*next_batch)
+
+    def _dispatch(self, key: Tuple, batch: List[_PendingRequest]):
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        dispatched_at = time.monotonic()
+        for request in batch:
+            QUEUE_WAIT_SECONDS.observe(dispatched_at - request.enqueued_at)
+        BATCH_SIZE.observe(len(batch))
+
+        try:
+            results = self.summarizer(
+                [request.text for request in batch],
+                batch_size=len(batch),
+                truncation=True,
+                **dict(key)
+            )
+            if len(results) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} summaries, got {len(results)}")
+            BATCH_SECONDS.observe(time.monotonic() - dispatched_at)
+            self._count_tokens(batch, results)
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+        except Exception as e:
+            logging.error(f"Batched inference error ({len(batch)} texts): {str(e)}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def _count_tokens(self, batch: List[_PendingRequest], results: List[Dict]):
+        tokenizer = getattr(self.summarizer, 'tokenizer', None)
+        if tokenizer is None:
+            return
+        try:
+            inputs = tokenizer([request.text for request in batch], truncation=True, verbose=False)
+            outputs = tokenizer([result.get('summary_text', '') for result in results], add_special_tokens=False)
+            INPUT_TOKENS.inc(sum(len(ids) for ids in inputs['input_ids']))
+            OUTPUT_TOKENS.inc(sum(len(ids) for ids in outputs['input_ids']))
+        except Exception as e:
+            logging.warning(f"Unable to count batch tokens: {str(e)}")
@@ -8,9 +8,12 @@ from nltk.probability import FreqDist
 import string
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import time
-import gc
+from functools import partial
+from cache import get_summary_cache
+from extractive import extractive_summary
+from nltk_setup import download_nltk_bundle
 
 # Create logs directory if it doesn't exist
 os.makedirs('logs', exist_ok=True)
@@ -29,42 +32,64 @@ logging.basicConfig(
     ]
 )
 
-# NLTK data download with error handling and timeout
+SUMMARY_DOCUMENT_WORKERS = int(os.getenv('SUMMARY_DOCUMENT_WORKERS', '4'))
+
+# NLTK data download into the local bundle; the service itself never downloads at runtime
 def download_nltk_data(timeout=30):
     try:
-        nltk.download('punkt', quiet=True)
-        nltk.download('stopwords', quiet=True)
+        download_nltk_bundle()
     except Exception as e:
         logging.warning(f"Failed to download NLTK data: {e}")
 
-def generate_summary(model, documents, summary_depth: float = 0.3, language: str = 'english') -> List[dict]:
+def generate_summary(model, documents, summary_depth: float = 0.3, language: str = 'english',
+                     max_time: Optional[float] = None, progress_callback: Optional[Callable] = None,
+                     partial_callback: Optional[Callable] = None,
+                     document_callback: Optional[Callable] = None) -> List[dict]:
     """
     Enhanced summary generation with robust error handling and flexible processing.
     
     Args:
         model: Summarization model instance
-        documents (list): List of document dictionaries
+        documents (Iterable): Document dictionaries; an iterator is summarized as it yields
         summary_depth (float): Depth of summarization
         language (str): Language of summarization
+        max_time (float): Per-document time budget in seconds, model default if None
+        progress_callback (Callable): Receives (chunks done, chunks added) increments
+        partial_callback (Callable): Receives (title, level, chunk index, summary) per finished chunk
+        document_callback (Callable): Receives each summary dictionary as soon as it is ready
     
     Returns:
-        List of summary dictionaries
+        List of summary dictionaries: title, content, complete, False when content is a fallback,
+            and truncated, True when extraction stopped at its size budget before the end
     """
-    if not documents:
+    if isinstance(documents, list) and not documents:
         logging.warning("No documents provided for summarization")
         return []
 
     try:
-        total_docs = len(documents)
-        if total_docs == 0:
-            raise ValueError("No valid documents provided")
-
         summary = []
-        max_workers = min(os.cpu_count() or 1, total_docs)
+        # Documents mostly wait on the shared inference scheduler; a few threads keep it fed
+        max_workers = SUMMARY_DOCUMENT_WORKERS
+        if isinstance(documents, list):
+            max_workers = min(max_workers, len(documents))
+
+        summary_cache = get_summary_cache()
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_summaries = {}
             for i, doc in enumerate(documents):
+                # Documents already answered from the summary cache skip generation
+                if 'summary' in doc:
+                    summary.append({
+                        'title': doc.get('name', f'Document {i+1}'),
+                        'content': doc['summary'],
+                        'complete': True,
+                        'truncated': False
+                    })
+                    if document_callback:
+                        document_callback(summary[-1])
+                    continue
+
                 # Remove minimum content length check
                 content = doc.get('content', '').strip()
                 
@@ -74,24 +99,40 @@ def generate_summary(model, documents, summary_depth: float = 0.3, language: str
                     model, 
                     content, 
                     summary_depth,
-                    doc.get('name', f'Document {i+1}')
+                    doc.get('name', f'Document {i+1}'),
+                    max_time,
+                    progress_callback,
+                    partial(partial_callback, doc.get('name', f'Document {i+1}')) if partial_callback else None
                 )
                 future_summaries[future] = {
                     'title': doc.get('name', f'Document {i+1}'),
-                    'index': i
+                    'index': i,
+                    'content': content,
+                    'cache_key': doc.get('cache_key'),
+                    'truncated': doc.get('truncated', False)
                 }
 
             # Process completed futures
             for future in as_completed(future_summaries):
                 try:
-                    doc_summary = future.result()
+                    doc_summary, complete = future.result()
                     metadata = future_summaries[future]
+
+                    # Only complete model summaries of whole documents are cached, never error text,
+                    # deadline fallbacks, the original content or a summary of a truncated text
+                    if (metadata['cache_key'] and complete and not metadata['truncated'] and doc_summary
+                            and doc_summary != metadata['content']):
+                        summary_cache.put(metadata['cache_key'], doc_summary)
                     
                     # Always add summary, even if it's just the original content
                     summary.append({
                         'title': metadata['title'],
-                        'content': doc_summary
+                        'content': doc_summary,
+                        'complete': complete,
+                        'truncated': metadata['truncated']
                     })
+                    if document_callback:
+                        document_callback(summary[-1])
                 except Exception as e:
                     logging.error(f"Error processing document: {str(e)}")
 
@@ -100,10 +141,50 @@ def generate_summary(model, documents, summary_depth: float = 0.3, language: str
     except Exception as e:
         logging.error(f"Error in generate_summary: {str(e)}")
         return []
-    finally:
-        gc.collect()
 
-def _safe_generate_summary(model, content, summary_depth, doc_name):
+def generate_extractive_summary(documents, summary_depth: float = 0.3, language: str = 'english',
+                                document_callback: Optional[Callable] = None) -> List[dict]:
+    """
+    Summarize documents by sentence ranking alone, without loading the summarization model.
+    
+    Args:
+        documents (list): List of document dictionaries
+        summary_depth (float): Depth of summarization
+        language (str): Language of summarization
+        document_callback (Callable): Receives each summary dictionary as soon as it is ready
+    
+    Returns:
+        List of summary dictionaries, in the same shape as generate_summary
+    """
+    summary = []
+    summary_cache = get_summary_cache()
+    for i, doc in enumerate(documents):
+        title = doc.get('name', f'Document {i+1}')
+        if 'summary' in doc:
+            summary.append({'title': title, 'content': doc['summary'], 'complete': True, 'truncated': False})
+            if document_callback:
+                document_callback(summary[-1])
+            continue
+
+        content = doc.get('content', '').strip()
+        try:
+            doc_summary = extractive_summary(content, summary_depth, language) or content
+            complete = True
+        except Exception as e:
+            logging.error(f"Extractive summary error for {title}: {str(e)}")
+            doc_summary = content
+            complete = False
+
+        truncated = doc.get('truncated', False)
+        if doc.get('cache_key') and complete and not truncated and doc_summary != content:
+            summary_cache.put(doc['cache_key'], doc_summary)
+        summary.append({'title': title, 'content': doc_summary, 'complete': complete, 'truncated': truncated})
+        if document_callback:
+            document_callback(summary[-1])
+    return summary
+
+def _safe_generate_summary(model, content, summary_depth, doc_name, max_time=None, progress_callback=None,
+                           partial_callback=None):
     """
     Safely generate summary with enhanced fallback mechanisms.
     
@@ -112,29 +193,32 @@ def _safe_generate_summary(model, content, summary_depth, doc_name):
         content (str): Document content
         summary_depth (float): Summarization depth
         doc_name (str): Name of the document for logging
+        max_time (float): Time budget in seconds, model default if None
+        progress_callback (Callable): Receives (chunks done, chunks added) increments
+        partial_callback (Callable): Receives (level, chunk index, summary) per finished chunk
     
     Returns:
-        str: Generated summary or original content if summarization is impossible
+        Tuple[str, bool]: Generated summary or original content if summarization is impossible,
+            and whether it is a complete model summary
     """
     try:
-        # Limit content length to prevent excessive processing
-        max_content_length = 100000
-        truncated_content = content[:max_content_length]
-        
         # If content is very short, use entire content
-        if len(truncated_content.strip()) < 10:
+        if len(content.strip()) < 10:
             logging.info(f"Very short content for {doc_name}. Using entire content.")
-            return truncated_content
+            return content, True
         
-        # Attempt summarization with fallback
-        summary = model.generate_summary(truncated_content, summary_depth)
+        # Chunked map-reduce keeps every part of the document within the model window
+        summary_kwargs = {'progress_callback': progress_callback, 'partial_callback': partial_callback}
+        if max_time is not None:
+            summary_kwargs['max_time'] = max_time
+        summary, complete = model.summarize_document(content, summary_depth, **summary_kwargs)
         
         # If no summary generated, use original content
         if not summary or len(summary.strip()) == 0:
             logging.warning(f"No summary generated for {doc_name}. Using original content.")
-            return truncated_content
+            return content, False
         
-        return summary
+        return summary, complete
     except Exception as e:
         logging.error(f"Summary generation error for {doc_name}: {str(e)}")
-        return content  # Guaranteed fallback to original content
+        return content, False  # Guaranteed fallback to original content
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import drop_repeated_lines
+
+
+def test_bare_numbers_and_fractions_are_content():
+    text = 'Revenue\n5000\n7200\n1234\n9800\n12/31\n1/15\n3/7\n'
+    kept, removed = drop_repeated_lines(text)
+    assert kept == text
+    assert removed == ''
+
+
+def test_single_column_rows_survive():
+    # One-column sheet: every row is a bare number, with no page breaks to tell footers apart
+    rows = [str(value) for value in range(100, 130)]
+    kept, removed = drop_repeated_lines('\n'.join(rows) + '\n')
+    assert kept.splitlines() == rows
+    assert removed == ''
+
+
+def test_footer_page_numbers_counting_up_are_dropped():
+    pages = [f"ACME Corp\nBody of page {number} about item {number}.\n{number}\n" for number in range(1, 6)]
+    kept, removed = drop_repeated_lines('\f'.join(pages) + '\f')
+    lines = kept.splitlines()
+    assert lines.count('ACME Corp') == 1
+    assert [line for line in lines if line.isdigit()] == ['1']
+    assert all(f"Body of page {number} about item {number}." in lines for number in range(1, 6))
+    assert removed.splitlines().count('ACME Corp') == 4
+
+
+def test_numbers_at_page_edges_that_do_not_count_up_stay():
+    pages = [f"Quarter {number}\nTotal\n{value}\n" for number, value in enumerate([5000, 7200, 1234, 9800], 1)]
+    kept, _ = drop_repeated_lines('\f'.join(pages))
+    assert [line for line in kept.splitlines() if line.isdigit()] == ['5000', '7200', '1234', '9800']
+
+
+def test_labelled_page_numbers_are_dropped_anywhere():
+    text = 'Intro\nPage 1 of 3\nMiddle\nPage 2 of 3\nEnd\nPage 3 of 3\n'
+    kept, _ = drop_repeated_lines(text)
+    assert kept.splitlines() == ['Intro', 'Page 1 of 3', 'Middle', 'End']
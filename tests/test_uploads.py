@@ -0,0 +1,148 @@
+import io
+import os
+import sys
+import json
+import base64
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uploads
+from uploads import parse_json_uploads
+
+
+class TrickleStream(io.RawIOBase):
+    """Body stream that returns at most step bytes per read, like a slow client."""
+
+    def __init__(self, data: bytes, step: int):
+        self.data = data
+        self.step = step
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        chunk = self.data[self.position:self.position + min(self.step, size if size > 0 else self.step)]
+        self.position += len(chunk)
+        return chunk
+
+
+@pytest.fixture(autouse=True)
+def upload_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOAD_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+def _parse(body, step=None):
+    data = body if isinstance(body, bytes) else body.encode('utf-8')
+    stream = TrickleStream(data, step) if step else io.BytesIO(data)
+    return parse_json_uploads(stream)
+
+
+def _content(upload):
+    with upload.open() as content:
+        return content if isinstance(content, str) else content.read()
+
+
+def test_decodes_base64_files():
+    payload = b'%PDF-1.4 binary \x00\xff payload'
+    body = json.dumps({'files': [{'name': 'a.pdf', 'content': base64.b64encode(payload).decode()}]})
+    fields, files = _parse(body)
+    assert fields == {}
+    assert [upload.name for upload in files] == ['a.pdf']
+    assert _content(files[0]) == payload
+
+
+@pytest.mark.parametrize('step', [1, 3, 7, 64])
+def test_base64_split_across_read_boundaries(monkeypatch, step):
+    # Decode incrementally after a few characters so every split position is exercised
+    monkeypatch.setattr(uploads, 'BASE64_PROBE_CHARS', 8)
+    payload = bytes(range(256)) * 3
+    encoded = base64.encodebytes(payload).decode()  # wrapped lines, escaped as \n in the JSON
+    body = json.dumps({'files': [{'name': 'x.bin', 'content': encoded}, {'name': 'y.bin', 'content': 'QUJD'}]})
+    _, files = _parse(body, step)
+    assert _content(files[0]) == payload
+    assert _content(files[1]) == b'ABC'
+
+
+@pytest.mark.parametrize('step', [None, 1])
+def test_escapes_match_json_loads(step):
+    body = json.dumps({
+        'title': 'quote " backslash \\ slash / tab \t newline \n café \U0001F600',
+        'files': [{'name': 'résumé "v2".txt', 'content': 'plain \\ text — not base64'}]
+    }, ensure_ascii=True)
+    expected = json.loads(body)
+    fields, files = _parse(body, step)
+    assert fields['title'] == expected['title']
+    assert files[0].name == expected['files'][0]['name']
+    assert _content(files[0]) == expected['files'][0]['content']
+
+
+def test_multibyte_utf8_split_across_reads():
+    body = json.dumps({'note': 'é中\U0001F600', 'files': []}, ensure_ascii=False).encode('utf-8')
+    fields, files = _parse(body, 1)
+    assert fields == {'note': 'é中\U0001F600'}
+    assert files == []
+
+
+def test_non_upload_keys_are_returned_or_ignored():
+    body = json.dumps({
+        'summary_depth': 2.5,
+        'options': {'mode': 'extractive', 'flags': [True, False, None], 'count': -3},
+        'files': [{'name': 'a.txt', 'content': 'SGVsbG8=', 'size': 5, 'meta': {'k': [1, 2]}}],
+        'language': 'english'
+    })
+    fields, files = _parse(body)
+    assert fields == {
+        'summary_depth': 2.5,
+        'options': {'mode': 'extractive', 'flags': [True, False, None], 'count': -3},
+        'language': 'english'
+    }
+    assert _content(files[0]) == b'Hello'
+
+
+def test_missing_or_non_string_content():
+    body = json.dumps({'files': [{'name': 'a.txt'}, {'name': 'b.txt', 'content': None}, {'content': 'QQ=='}]})
+    _, files = _parse(body)
+    assert [_content(upload) for upload in files] == ['', '', b'A']
+    assert files[2].name == 'unknown'
+
+
+def test_invalid_base64_after_valid_prefix_gives_empty_upload(monkeypatch):
+    monkeypatch.setattr(uploads, 'BASE64_PROBE_CHARS', 8)
+    body = json.dumps({'files': [{'name': 'a.bin', 'content': 'QUJDREVGR0hJSktM' + '!!!!'}]})
+    # Small reads so the valid prefix is decoded before the bad characters arrive
+    _, files = _parse(body, 4)
+    assert _content(files[0]) == b''
+
+
+def test_text_with_non_base64_characters_stays_text():
+    body = json.dumps({'files': [{'name': 'a.txt', 'content': 'Plain text, not base64!!'}]})
+    _, files = _parse(body)
+    assert _content(files[0]) == 'Plain text, not base64!!'
+
+
+def test_every_truncation_raises_and_cleans_up(upload_folder):
+    body = json.dumps({
+        'summary_depth': 1,
+        'files': [{'name': 'a\\b.txt', 'content': base64.b64encode(b'hello world').decode()},
+                  {'name': 'c.txt', 'content': 'Y29udGVudA=='}]
+    }).encode('utf-8')
+    for cut in range(len(body)):
+        with pytest.raises(ValueError):
+            _parse(body[:cut])
+        # Files spooled before the error are closed, which removes them
+        assert os.listdir(upload_folder) == []
+
+
+@pytest.mark.parametrize('body', [
+    '{"files": [{"name": "a", "content": "x"} "b"]}',
+    '{"files": [{"name": "a" "content": "x"}]}',
+    '{"files": [{"name": "\\q"}]}',
+    '["files"]',
+])
+def test_malformed_bodies_raise(body):
+    with pytest.raises(ValueError):
+        _parse(body)
@@ -0,0 +1,412 @@
+import os
+import io
+import mmap
+import codecs
+import base64
+import binascii
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from flask import Request
+
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', '/tmp/uploads')
+# Bytes read from the request body per step when parsing JSON uploads
+UPLOAD_BLOCK_SIZE = int(os.getenv('UPLOAD_BLOCK_SIZE', str(1024 * 1024)))
+# Base64 text held back before the first decode so plain-text payloads can still be recognised
+BASE64_PROBE_CHARS = 1024 * 1024
+
+
+class SpoolingRequest(Request):
+    """Flask request that writes every uploaded file straight to a temp file under UPLOAD_FOLDER."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return _spool_file()
+
+
+def _spool_file() -> BinaryIO:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=UPLOAD_FOLDER, prefix='upload-')
+
+
+class MappedFile(io.RawIOBase):
+    """Read-only, seekable file interface over a memory map for the document parsers."""
+
+    def __init__(self, mapped: mmap.mmap, name: Optional[str] = None):
+        self.mapped = mapped
+        self.name = name
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.mapped[self.position:self.position + len(buffer)]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.mapped)
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self.position = offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+class SpooledUpload:
+    """
+    An uploaded document held on disk instead of in memory.
+
+    ``open()`` yields a memory-mapped file object for binary uploads, or the
+    decoded string for JSON payloads that turned out not to be base64.
+    """
+
+    def __init__(self, name: str, fileobj: Optional[BinaryIO] = None, text: Optional[str] = None,
+                 owned_path: Optional[str] = None):
+        self.name = name
+        self.fileobj = fileobj
+        self.text = text
+        # File this upload removes itself on close (set for detached uploads)
+        self.owned_path = owned_path
+
+    def detach(self) -> 'SpooledUpload':
+        """
+        Return a copy of this upload that outlives the request that received it.
+
+        The spooled file is hard-linked under UPLOAD_FOLDER, so no data is copied
+        unless the source is not a file on the same filesystem.
+        """
+        if self.text is not None:
+            return SpooledUpload(self.name, text=self.text)
+
+        self.fileobj.flush()
+        fd, path = tempfile.mkstemp(dir=UPLOAD_FOLDER, prefix='detached-')
+        os.close(fd)
+        source = getattr(self.fileobj, 'name', None)
+        try:
+            os.unlink(path)
+            os.link(source, path)
+        except (OSError, TypeError):
+            with open(path, 'wb') as f:
+                self.fileobj.seek(0)
+                shutil.copyfileobj(self.fileobj, f)
+        return SpooledUpload(self.name, fileobj=open(path, 'rb'), owned_path=path)
+
+    @property
+    def path(self) -> Optional[str]:
+        """Path of the spooled file on disk, or None for decoded text and in-memory streams."""
+        path = getattr(self.fileobj, 'name', None)
+        if self.text is None and isinstance(path, str) and os.path.isfile(path):
+            self.fileobj.flush()
+            return path
+        return None
+
+    @property
+    def size(self) -> int:
+        """Length of the upload in bytes (characters for decoded text)."""
+        if self.text is not None:
+            return len(self.text)
+        position = self.fileobj.tell()
+        size = self.fileobj.seek(0, io.SEEK_END)
+        self.fileobj.seek(position)
+        return size
+
+    @contextmanager
+    def open(self):
+        if self.text is not None:
+            yield self.text
+            return
+
+        self.fileobj.flush()
+        size = self.fileobj.seek(0, io.SEEK_END)
+        self.fileobj.seek(0)
+        if size == 0:
+            yield io.BytesIO(b'')
+            return
+
+        try:
+            fileno = self.fileobj.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            # In-memory stream, nothing to map
+            yield self.fileobj
+            return
+
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        try:
+            yield MappedFile(mapped, name=getattr(self.fileobj, 'name', None))
+        finally:
+            mapped.close()
+
+    def close(self):
+        try:
+            if self.fileobj is not None:
+                self.fileobj.close()
+            if self.owned_path:
+                os.unlink(self.owned_path)
+                self.owned_path = None
+        except Exception as e:
+            logging.warning(f"Error removing spooled upload {self.name}: {str(e)}")
+
+
+class _Base64Spooler:
+    """Incrementally decodes base64 text into a temp file."""
+
+    def __init__(self):
+        self.fileobj = _spool_file()
+        self.pending = []
+        self.pending_length = 0
+        self.decoded_any = False
+        self.is_text = False
+        self.failed = False
+
+    def write(self, text: str):
+        if self.failed:
+            return
+        self.pending.append(text)
+        self.pending_length += len(text)
+        if not self.is_text and self.pending_length >= BASE64_PROBE_CHARS:
+            self._decode(final=False)
+
+    def _decode(self, final: bool):
+        text = ''.join(''.join(self.pending).split())
+        usable = len(text) if final else len(text) - len(text) % 4
+        try:
+            if usable:
+                self.fileobj.write(base64.b64decode(text[:usable], validate=True))
+        except (binascii.Error, ValueError):
+            if self.decoded_any:
+                logging.error("Invalid base64 data in JSON upload")
+                self.failed = True
+                self.pending = []
+            else:
+                # Not base64 at all: keep the raw string, as extract_text_from_document always has
+                self.is_text = True
+            return
+        self.decoded_any = True
+        self.pending = [text[usable:]]
+        self.pending_length = len(text) - usable
+
+    def finish(self, name: str) -> SpooledUpload:
+        if not self.is_text and not self.failed:
+            self._decode(final=True)
+        if self.is_text:
+            self.fileobj.close()
+            return SpooledUpload(name, text=''.join(self.pending))
+        if self.failed:
+            self.fileobj.close()
+            return SpooledUpload(name, fileobj=io.BytesIO(b''))
+        return SpooledUpload(name, fileobj=self.fileobj)
+
+    def close(self):
+        self.fileobj.close()
+
+
+class _JsonStreamReader:
+    """Minimal incremental JSON reader over a byte stream."""
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, stream: BinaryIO, block_size: int = UPLOAD_BLOCK_SIZE):
+        self.stream = stream
+        self.block_size = block_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.stream.read(self.block_size)
+        if not data:
+            self.eof = True
+            tail = self.decoder.decode(b'', final=True)
+        else:
+            tail = self.decoder.decode(data)
+        self.buffer = self.buffer[self.pos:] + tail
+        self.pos = 0
+        return bool(tail) or not self.eof
+
+    def peek(self) -> str:
+        while self.pos >= len(self.buffer):
+            if not self._fill():
+                return ''
+        return self.buffer[self.pos]
+
+    def next(self) -> str:
+        char = self.peek()
+        if not char:
+            raise ValueError("Unexpected end of JSON body")
+        self.pos += 1
+        return char
+
+    def expect(self, char: str):
+        self.skip_whitespace()
+        found = self.next()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON body, found '{found}'")
+
+    def skip_whitespace(self):
+        while self.peek() in (' ', '\t', '\r', '\n'):
+            self.pos += 1
+
+    def string_chunks(self) -> Iterator[str]:
+        """Yield the decoded pieces of a string whose opening quote was already consumed."""
+        while True:
+            if self.pos >= len(self.buffer) and not self._fill():
+                raise ValueError("Unterminated string in JSON body")
+            quote = self.buffer.find('"', self.pos)
+            backslash = self.buffer.find('\\', self.pos)
+            stops = [index for index in (quote, backslash) if index != -1]
+            if not stops:
+                yield self.buffer[self.pos:]
+                self.pos = len(self.buffer)
+                continue
+
+            end = min(stops)
+            if end > self.pos:
+                yield self.buffer[self.pos:end]
+            self.pos = end + 1
+            if end == quote:
+                return
+
+            escape = self.next()
+            if escape == 'u':
+                code = int(''.join(self.next() for _ in range(4)), 16)
+                if 0xD800 <= code < 0xDC00 and self.peek() == '\\':
+                    self.next()
+                    if self.next() != 'u':
+                        raise ValueError("Invalid surrogate pair in JSON body")
+                    low = int(''.join(self.next() for _ in range(4)), 16)
+                    code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                yield chr(code)
+            elif escape in self._ESCAPES:
+                yield self._ESCAPES[escape]
+            else:
+                raise ValueError(f"Invalid escape '\\{escape}' in JSON body")
+
+    def value(self):
+        """Read any JSON value fully into memory; only used for small fields."""
+        self.skip_whitespace()
+        char = self.next()
+        if char == '"':
+            return ''.join(self.string_chunks())
+        if char == '{':
+            return dict(self.members(lambda key: self.value()))
+        if char == '[':
+            return list(self.items(self.value))
+
+        literal = char
+        while self.peek() and self.peek() not in ',]} \t\r\n':
+            literal += self.next()
+        literals = {'true': True, 'false': False, 'null': None}
+        if literal in literals:
+            return literals[literal]
+        try:
+            return int(literal)
+        except ValueError:
+            return float(literal)
+
+    def members(self, read_value) -> Iterator[Tuple[str, object]]:
+        """Iterate the members of an object whose opening brace was consumed."""
+        self.skip_whitespace()
+        if self.peek() == '}':
+            self.next()
+            return
+        while True:
+            self.expect('"')
+            key = ''.join(self.string_chunks())
+            self.expect(':')
+            yield key, read_value(key)
+            self.skip_whitespace()
+            separator = self.next()
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' in JSON body, found '{separator}'")
+
+    def items(self, read_value) -> Iterator[object]:
+        """Iterate the items of an array whose opening bracket was consumed."""
+        self.skip_whitespace()
+        if self.peek() == ']':
+            self.next()
+            return
+        while True:
+            yield read_value()
+            self.skip_whitespace()
+            separator = self.next()
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON body, found '{separator}'")
+
+
+def parse_json_uploads(stream: BinaryIO) -> Tuple[Dict, List[SpooledUpload]]:
+    """
+    Parse a ``{"files": [{"name": ..., "content": <base64>}, ...]}`` body incrementally.
+
+    Each ``content`` string is base64-decoded block by block straight into a temp
+    file, so neither the JSON body nor the decoded file is ever held in memory whole.
+
+    Args:
+        stream: Request body stream
+
+    Returns:
+        Tuple[Dict, List[SpooledUpload]]: Remaining top-level fields and the spooled files
+    """
+    reader = _JsonStreamReader(stream)
+    uploads = []
+
+    def read_file_field(key):
+        reader.skip_whitespace()
+        if key != 'content' or reader.peek() != '"':
+            return reader.value()
+        reader.next()
+        spooler = _Base64Spooler()
+        try:
+            for chunk in reader.string_chunks():
+                spooler.write(chunk)
+        except Exception:
+            spooler.close()
+            raise
+        return spooler
+
+    def read_file():
+        reader.expect('{')
+        fields = dict(reader.members(read_file_field))
+        content = fields.get('content', '')
+        name = fields.get('name', 'unknown')
+        if isinstance(content, _Base64Spooler):
+            upload = content.finish(name)
+        else:
+            upload = SpooledUpload(name, text=content if isinstance(content, str) else '')
+        uploads.append(upload)
+        return None
+
+    def read_top_level(key):
+        if key != 'files':
+            return reader.value()
+        reader.expect('[')
+        for _ in reader.items(read_file):
+            pass
+        return None
+
+    try:
+        reader.expect('{')
+        fields = {key: value for key, value in reader.members(read_top_level) if key != 'files'}
+    except Exception:
+        for upload in uploads:
+            upload.close()
+        raise
+    return fields, uploads